@@ -1,41 +1,462 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import streamlit.components.v1 as components
 import requests
 import io
-import base64
+import contextlib
+import functools
+import copy
 import hashlib
+import json
 import os
+import pickle
+import random
+import re
+import secrets
+import shutil
+import subprocess
 import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+import pyarrow as pa
+import pyarrow.parquet as pq
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
+from starlette.responses import FileResponse, PlainTextResponse
+from starlette.routing import Route
 
 # === 1. 設定區 ===
 # ⚠️ 請確保這兩個網址分別是「總資料庫」分頁與「Clients」分頁獨立發布為 CSV 的網址
-CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSnViFsUwWYASaR5i1PefsWE4b6-5wwqTbJFJG8vysgcHYZDKzq-wwK4hM4xOtet3B65UjohzRjh38C/pub?gid=0&single=true&output=csv"
-CSV_LOGO_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vSnViFsUwWYASaR5i1PefsWE4b6-5wwqTbJFJG8vysgcHYZDKzq-wwK4hM4xOtet3B65UjohzRjh38C/pub?gid=1588470763&single=true&output=csv" # 👈 請務必填入 Clients 分頁專屬的 CSV 網址
+# 💡 試算表、小喇叭圖示、Logo 圖檔網址都可用環境變數覆寫 (SWD_CSV_URL / SWD_CSV_LOGO_URL / SWD_SPEAKER_ICON_URL / SWD_LOGO_IMAGE_URL)，
+#    離線基準測試 (benchmarks/) 就是靠這個改連本機假伺服器
+CSV_URL = os.environ.get("SWD_CSV_URL", "https://docs.google.com/spreadsheets/d/e/2PACX-1vSnViFsUwWYASaR5i1PefsWE4b6-5wwqTbJFJG8vysgcHYZDKzq-wwK4hM4xOtet3B65UjohzRjh38C/pub?gid=0&single=true&output=csv")
+CSV_LOGO_URL = os.environ.get("SWD_CSV_LOGO_URL", "https://docs.google.com/spreadsheets/d/e/2PACX-1vSnViFsUwWYASaR5i1PefsWE4b6-5wwqTbJFJG8vysgcHYZDKzq-wwK4hM4xOtet3B65UjohzRjh38C/pub?gid=1588470763&single=true&output=csv") # 👈 請務必填入 Clients 分頁專屬的 CSV 網址
 
 PASSWORD = "888"
+ADMIN_PASSWORD = os.environ.get("SWD_ADMIN_PASSWORD") or None  # 💡 以管理員密碼登入才看得到效能監控面板；未設定環境變數則不開放管理員登入
+RESULTS_PAGE_SIZE = 20  # 搜尋列表每頁筆數，只渲染目前這一頁的元件
 SITE_URL = "https://swd-case.streamlit.app" 
 
 # 💡 預設的去背高畫質小喇叭圖標網址，用來當作 PPT 內音軌的精美顯示外觀
-DEFAULT_SPEAKER_ICON_URL = "https://img.icons8.com/color/96/speaker.png"
+DEFAULT_SPEAKER_ICON_URL = os.environ.get("SWD_SPEAKER_ICON_URL", "https://img.icons8.com/color/96/speaker.png")
+
+# 💡 簡報素材併發下載的執行緒上限 (影音 + Logo 同時開跑，避免單一慢連結拖垮整份簡報)
+PACK_FETCH_WORKERS = 8
+
+# 💡 每張投影片固定 3x2 六宮格；開啟批次模式後可挑選最多 BATCH_MAX_ITEMS 個案例，自動分頁成多張六宮格
+PACK_GRID_SIZE = 6
+BATCH_MAX_ITEMS = 60
+PACK_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
+
+# 💡 共用 HTTP 連線池：同一主機沿用 keep-alive 連線 (省去每次 TCP+TLS 握手)，連線失敗與 429/5xx 以指數退避重試 HTTP_RETRIES 次；
+#    每個主機最多 HTTP_HOST_CONCURRENCY 條並行請求，HTTP_CONNECT_TIMEOUT 秒內連不上就放棄，錯誤一律計入效能面板
+#    試聽、試算表同步等有人在等的請求另走 HTTP_INTERACTIVE_CONCURRENCY 條名額，不會排在匯出的大檔下載後面；
+#    互動請求排隊超過 HTTP_INTERACTIVE_WAIT_SECS 秒就放棄並計入 upstream_busy；匯出等批次請求只是在排隊不算失敗，一律等到有名額
+HTTP_POOL_SIZE = 16
+HTTP_HOST_CONCURRENCY = 4
+HTTP_INTERACTIVE_CONCURRENCY = 2
+HTTP_INTERACTIVE_WAIT_SECS = 5
+HTTP_RETRIES = 2
+HTTP_BACKOFF_SECS = 0.5
+HTTP_CONNECT_TIMEOUT = 3.05
+
+# 💡 影音下載改為分段串流寫入暫存檔，超過上限立即中止 (可用環境變數 SWD_MEDIA_MAX_MB / SWD_PREVIEW_MAX_MB 調整)
+MEDIA_MAX_BYTES = int(os.environ.get("SWD_MEDIA_MAX_MB", "300")) * 1024 * 1024
+PREVIEW_MAX_BYTES = int(os.environ.get("SWD_PREVIEW_MAX_MB", "30")) * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+# 💡 影音本機快取：以 generate_id 同一把鑰匙存檔，一天內直接命中，過期才帶 ETag/Last-Modified 回源驗證，超過容量依最近使用時間淘汰
+MEDIA_CACHE_DIR = os.environ.get("SWD_MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "swd_media_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get("SWD_MEDIA_CACHE_MB", "2048")) * 1024 * 1024
+MEDIA_CACHE_FRESH_SECS = 24 * 3600
+MEDIA_CACHE_GRACE_SECS = 600  # 十分鐘內用過的檔案可能正在試聽或封裝，淘汰時先跳過
+
+# 💡 Logo 素材庫：每個 Drive 檔案 ID 只下載、驗證一次，縮成 1.6 吋 Logo 欄位用的 PNG (以 200 dpi 計) 存在本機
+LOGO_IMAGE_URL = os.environ.get("SWD_LOGO_IMAGE_URL", "https://lh3.googleusercontent.com/u/0/d/{file_id}")
+LOGO_STORE_DIR = os.path.join(MEDIA_CACHE_DIR, "logos")
+LOGO_MAX_PX = 320
+LOGO_MAX_BYTES = 20 * 1024 * 1024
+LOGO_RETRY_SECS = 3600  # 確認無效的 Logo 一小時內不再重抓
+
+# 💡 簡報影音瘦身 (本機有 ffmpeg 才啟用，否則原檔嵌入)：音訊轉成 PACK_AUDIO_BITRATE 的 MP3，影片縮到六宮格 1.4x1.0 吋縮圖
+#    (以 400 dpi 計，放大播放仍清楚) 並擷取代表畫面當封面；成品依原檔內容雜湊存放，重複匯出直接沿用 (SWD_PACK_OPTIMIZE=0 可關閉)
+FFMPEG_BIN = os.environ.get("SWD_FFMPEG") or shutil.which("ffmpeg")
+PACK_OPTIMIZE_MEDIA = os.environ.get("SWD_PACK_OPTIMIZE", "1") != "0"
+PACK_AUDIO_BITRATE = "96k"
+PACK_VIDEO_BOX = (560, 400)
+PACK_TRANSCODE_TIMEOUT = 300
+MEDIA_OPTIMIZED_DIR = os.path.join(MEDIA_CACHE_DIR, "optimized")
+
+# 💡 簡報封裝：先嵌入佔位影音存成草稿，再把佔位檔逐一串流換成快取裡的影音檔，完成的 PPTX 寫在 EXPORT_DIR 供下載
+EXPORT_DIR = os.path.join(MEDIA_CACHE_DIR, "exports")
+PACK_PLACEHOLDER_MAGIC = b"SWD-PACK-PLACEHOLDER:"
+
+# 💡 試算表同步間隔 (秒)：間隔內直接使用記憶體中的快照
+SHEET_REFRESH_SECS = 60
+
+# 💡 試算表快照落地：每次重建成功後把整理好的總資料庫 / Logo 表 (含 uid、short 等衍生欄位與倒排索引) 存成 Parquet，
+#    行程重啟時直接讀回，不必等 Google 也不必重新解析；快照結構改變時請調高 SNAPSHOT_SCHEMA_VERSION 讓舊檔作廢
+SNAPSHOT_DIR = os.environ.get("SWD_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "swd_snapshots"))
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# 💡 背景同步執行緒：每隔約 BACKGROUND_REFRESH_SECS (±20% 抖動) 更新兩張試算表，頁面載入不必等 Google；
+#    另一條預熱執行緒替最常被挑選的 PREWARM_TOP_N 個案例預先下載影音、備妥所有 Logo，慢下載不會拖住試算表同步。
+#    心跳超過 BACKGROUND_STALE_SECS 沒更新就視為卡住，頁面改回自行同步
+BACKGROUND_REFRESH_SECS = 60
+BACKGROUND_REFRESH_JITTER = 0.2
+BACKGROUND_STALE_SECS = 2 * BACKGROUND_REFRESH_SECS
+PREWARM_TOP_N = 12
+
+# 💡 每個 session 的記憶體用量登記表：超過 SESSION_STATS_TTL_SECS 沒有動作的 session 視為已離開
+#    pickle 估算大小很貴，每個 session 最多每 SESSION_STATS_SAMPLE_SECS 秒量一次，其間的 rerun 只更新閒置時間
+SESSION_STATS_TTL_SECS = 1800
+SESSION_STATS_SAMPLE_SECS = 30
+ROW_WIDGET_PREFIXES = ("chk_", "exp_", "p_", "s_", "sel_logo_pair_", "panel_play_", "panel_del_", "del_item_")
+
+# 💡 效能計時每項只保留最近 TELEMETRY_WINDOW 筆算 p95；設定 SWD_METRICS_FILE 時背景執行緒每輪把 Prometheus 文字格式寫入該檔
+TELEMETRY_WINDOW = 500
+METRICS_FILE = os.environ.get("SWD_METRICS_FILE")
+
+# 💡 簡報匯出改為背景工作：整個行程最多 EXPORT_WORKERS 份簡報同時封裝，其餘排隊；
+#    完成的檔案保留 EXPORT_JOB_TTL_SECS 供下載，進度每 EXPORT_POLL_SECS 秒更新一次
+EXPORT_WORKERS = 2
+EXPORT_JOB_TTL_SECS = 3600
+EXPORT_POLL_SECS = 1.0
 
 # === 2. 核心技術函數 ===
+@st.cache_resource
+def _telemetry():
+    """全行程共用的計時器與計數器"""
+    return {'lock': threading.Lock(), 'timers': {}, 'counters': Counter(), 'started_at': time.time()}
+
+def record_timing(name, secs):
+    t = _telemetry()
+    with t['lock']:
+        stat = t['timers'].get(name)
+        if stat is None:
+            stat = t['timers'][name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': deque(maxlen=TELEMETRY_WINDOW)}
+        stat['count'] += 1
+        stat['total'] += secs
+        stat['max'] = max(stat['max'], secs)
+        stat['recent'].append(secs)
+
+def count_metric(name, n=1):
+    t = _telemetry()
+    with t['lock']:
+        t['counters'][name] += n
+
+@contextlib.contextmanager
+def timed_section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def instrumented(name):
+    # 💡 熱路徑函數掛上計時，例外 (含 st.rerun) 也照樣記錄
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed_section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def upstream_timer(url):
+    # 依來源主機分開計時，方便找出拖慢頁面的外部服務
+    return timed_section(f"upstream {urlsplit(url).netloc}")
+
+def telemetry_snapshot():
+    """計時器 (毫秒) 與計數器的快照，可直接轉成 JSON"""
+    t = _telemetry()
+    with t['lock']:
+        timers = {name: (dict(stat), list(stat['recent'])) for name, stat in t['timers'].items()}
+        counters = dict(t['counters'])
+    return {
+        'uptime_secs': round(time.time() - t['started_at'], 1),
+        'timers': {name: {
+            'count': stat['count'],
+            'avg_ms': round(stat['total'] / stat['count'] * 1000, 2),
+            'p95_ms': round(float(np.percentile(recent, 95)) * 1000, 2),
+            'max_ms': round(stat['max'] * 1000, 2),
+            'total_secs': round(stat['total'], 3),
+        } for name, (stat, recent) in sorted(timers.items())},
+        'counters': dict(sorted(counters.items())),
+    }
+
+def telemetry_prometheus():
+    """同一份快照轉成 Prometheus 文字格式"""
+    snap = telemetry_snapshot()
+    label = lambda name: name.replace("\\", "\\\\").replace('"', '\\"')
+    lines = ["# TYPE swd_uptime_seconds gauge", f"swd_uptime_seconds {snap['uptime_secs']}",
+             "# TYPE swd_timer_seconds summary"]
+    for name, stat in snap['timers'].items():
+        lines.append(f'swd_timer_seconds{{name="{label(name)}",quantile="0.95"}} {stat["p95_ms"] / 1000}')
+        lines.append(f'swd_timer_seconds_sum{{name="{label(name)}"}} {stat["total_secs"]}')
+        lines.append(f'swd_timer_seconds_count{{name="{label(name)}"}} {stat["count"]}')
+    lines.append("# TYPE swd_events_total counter")
+    lines += [f'swd_events_total{{name="{label(name)}"}} {value}' for name, value in snap['counters'].items()]
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file():
+    if not METRICS_FILE: return
+    tmp_path = METRICS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(telemetry_prometheus())
+    os.replace(tmp_path, METRICS_FILE)
+
+@st.cache_resource
+def _http_client():
+    """全行程共用的 requests.Session 與各主機的並行上限"""
+    # 讀取逾時不重試 (慢主機快速失敗)；Retry-After 可能長達數分鐘，只用自己的退避時間，避免頁面卡住
+    retry = Retry(total=HTTP_RETRIES, read=False, status=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF_SECS,
+                  status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET']),
+                  respect_retry_after_header=False, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(PACK_HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return {'session': session, 'lock': threading.Lock(), 'gates': {}}
+
+@contextlib.contextmanager
+def http_get(url, timeout, headers=None, stream=False, interactive=False):
+    """經共用連線池發出 GET；回應在 with 區塊內有效，連線錯誤與 4xx/5xx 依主機計數
+    interactive=True 走互動名額，最多排隊 HTTP_INTERACTIVE_WAIT_SECS 秒；批次請求等到有名額為止。名額在讀完回應主體前都不會釋放"""
+    client = _http_client()
+    host = urlsplit(url).netloc
+    with client['lock']:
+        gate = client['gates'].setdefault((host, interactive), threading.BoundedSemaphore(
+            HTTP_INTERACTIVE_CONCURRENCY if interactive else HTTP_HOST_CONCURRENCY))
+    if not gate.acquire(timeout=HTTP_INTERACTIVE_WAIT_SECS if interactive else None):
+        count_metric(f"upstream_busy {host}")
+        raise RuntimeError(f"{host} 連線忙碌，排隊 {HTTP_INTERACTIVE_WAIT_SECS} 秒仍無空位")
+    try:
+        with upstream_timer(url):
+            try:
+                resp = client['session'].get(url, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, timeout), stream=stream)
+            except requests.RequestException as e:
+                count_metric(f"upstream_error {host} {type(e).__name__}")
+                raise
+            retries = getattr(resp.raw, 'retries', None)
+            if retries is not None and retries.history:
+                count_metric(f"upstream_retry {host}", len(retries.history))
+            if resp.status_code >= 400:
+                count_metric(f"upstream_error {host} HTTP {resp.status_code}")
+            with resp:
+                yield resp
+    finally:
+        gate.release()
+
 def generate_id(link):
     return hashlib.md5(str(link).encode()).hexdigest()[:10]
 
-@st.cache_data(ttl=120)
-def get_audio_base64(url):
+def to_download_url(link):
+    return link.split('?')[0] + "?download=1" if "sharepoint.com" in link else link
+
+def _write_capped(resp, fileobj, max_bytes):
+    """以 iter_content 分段寫入 fileobj，超過 max_bytes 立即中止，回傳寫入的位元組數"""
+    if int(resp.headers.get('Content-Length') or 0) > max_bytes:
+        raise RuntimeError(f"檔案超過 {max_bytes // (1024 * 1024)} MB 上限")
+    written = 0
+    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+        written += len(chunk)
+        if written > max_bytes:
+            raise RuntimeError(f"檔案超過 {max_bytes // (1024 * 1024)} MB 上限")
+        fileobj.write(chunk)
+    count_metric("download_bytes", written)
+    return written
+
+@st.cache_resource
+def _media_cache_lock():
+    return threading.Lock()
+
+@st.cache_resource
+def _inflight_calls():
+    return {'lock': threading.Lock(), 'calls': {}}
+
+def single_flight(key, fn, *args):
+    """同一把 key 同時只執行一次 fn(*args)，其餘呼叫者等它完成後共用結果或同一個例外"""
+    # 💡 分享連結一次發給整個團隊、多位業務同時試聽熱門企頻時，回源下載只會有一個
+    registry = _inflight_calls()
+    with registry['lock']:
+        call = registry['calls'].get(key)
+        leader = call is None
+        if leader:
+            call = registry['calls'][key] = {'done': threading.Event(), 'ok': False, 'result': None, 'error': None}
+    if not leader:
+        count_metric("single_flight_shared")
+        call['done'].wait()
+        if call['ok']: return call['result']
+        if call['error'] is not None: raise call['error']
+        return fn(*args)  # 領頭的呼叫被中斷 (如 st.rerun)，改由自己執行
+    try:
+        call['result'], call['ok'] = fn(*args), True
+        return call['result']
+    except Exception as e:
+        call['error'] = e
+        raise
+    finally:
+        with registry['lock']:
+            registry['calls'].pop(key, None)
+        call['done'].set()
+
+def _read_cache_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def _evict_media_cache(keep=()):
+    # 原始快取 (.bin) 與瘦身成品共用同一個容量上限；keep (即將回傳給呼叫端的檔案) 與最近用過的檔案不淘汰
+    entries, recent = [], time.time() - MEDIA_CACHE_GRACE_SECS
+    for folder, suffixes in ((MEDIA_CACHE_DIR, (".bin",)), (MEDIA_OPTIMIZED_DIR, (".mp4", ".mp3", ".png"))):
+        if not os.path.isdir(folder): continue
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(suffixes):
+                    st_info = entry.stat()
+                    entries.append((st_info.st_mtime, st_info.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= MEDIA_CACHE_MAX_BYTES or mtime >= recent: break
+        if path in keep: continue
+        for victim in ((path, path[:-4] + ".json") if path.endswith(".bin") else (path,)):
+            try: os.unlink(victim)
+            except OSError: pass
+        total -= size
+
+def get_cached_media(link, timeout=20, max_bytes=MEDIA_MAX_BYTES, interactive=False):
+    """回傳 link 在本機快取的檔案路徑，必要時才回源下載或驗證 (304 沿用舊檔)；同一檔案同時只回源一次
+    下載超過 max_bytes 立即中止 (試聽傳入 PREVIEW_MAX_BYTES)；已在快取裡的檔案不論大小直接回傳"""
+    # 上限不同的呼叫各自成一組，試聽中止下載不會連帶讓匯出失敗
+    return single_flight(("media", generate_id(link), max_bytes), _get_cached_media, link, timeout, max_bytes, interactive)
+
+def _get_cached_media(link, timeout, max_bytes, interactive):
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    key = generate_id(link)
+    data_path = os.path.join(MEDIA_CACHE_DIR, key + ".bin")
+    meta_path = os.path.join(MEDIA_CACHE_DIR, key + ".json")
+    meta = _read_cache_meta(meta_path) if os.path.exists(data_path) else None
+    now = time.time()
+
+    if meta and now - meta.get('checked_at', 0) < MEDIA_CACHE_FRESH_SECS:
+        os.utime(data_path)  # mtime 即最近使用時間，供 LRU 淘汰
+        count_metric("media_cache_hit")
+        return data_path
+
+    headers = {}
+    if meta and meta.get('etag'): headers['If-None-Match'] = meta['etag']
+    if meta and meta.get('last_modified'): headers['If-Modified-Since'] = meta['last_modified']
+
+    with http_get(to_download_url(link), timeout, headers=headers, stream=True, interactive=interactive) as resp:
+        if resp.status_code == 304 and meta:
+            meta['checked_at'] = now
+            _write_cache_meta(meta_path, meta)
+            os.utime(data_path)
+            count_metric("media_cache_revalidated")
+            return data_path
+        count_metric("media_cache_miss")
+        if resp.status_code != 200:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        fd, tmp_path = tempfile.mkstemp(dir=MEDIA_CACHE_DIR, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                size = _write_capped(resp, f, max_bytes)
+            os.replace(tmp_path, data_path)
+        except BaseException:
+            try: os.unlink(tmp_path)
+            except OSError: pass
+            raise
+        _write_cache_meta(meta_path, {
+            'link': link,
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'checked_at': now,
+            'size': size,
+        })
+
+    with _media_cache_lock():
+        _evict_media_cache(keep=(data_path,))
+    return data_path
+
+@instrumented("get_audio_path")
+def get_audio_path(url):
+    """回傳試聽用的本機快取檔路徑，交給 Streamlit 媒體檔端點以 HTTP Range 分段串流"""
     if not isinstance(url, str) or url == "": return None
-    target_url = url.split('?')[0] + "?download=1" if "sharepoint.com" in url else url
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get(target_url, headers=headers, timeout=10)
-        if resp.status_code == 200:
-            b64 = base64.b64encode(resp.content).decode('utf-8')
-            return f"data:audio/mpeg;base64,{b64}"
-    except: return None
-    return None
+        path = get_cached_media(url, timeout=10, max_bytes=PREVIEW_MAX_BYTES, interactive=True)
+        return path if os.path.getsize(path) <= PREVIEW_MAX_BYTES else None
+    except Exception: return None
+
+def get_logo_png(file_id):
+    """回傳已驗證並縮成 Logo 欄位大小的 PNG 路徑，同一個檔案 ID 只處理一次"""
+    return single_flight(("logo", file_id), _get_logo_png, file_id)
+
+def _get_logo_png(file_id):
+    png_path = os.path.join(LOGO_STORE_DIR, f"{file_id}.png")
+    if os.path.exists(png_path):
+        count_metric("logo_store_hit")
+        return png_path
+    bad_path = os.path.join(LOGO_STORE_DIR, f"{file_id}.bad")
+    if os.path.exists(bad_path) and time.time() - os.path.getmtime(bad_path) < LOGO_RETRY_SECS:
+        with open(bad_path, encoding="utf-8") as f:
+            raise RuntimeError(f.read())
+
+    os.makedirs(LOGO_STORE_DIR, exist_ok=True)
+    count_metric("logo_store_miss")
+    logo_url = LOGO_IMAGE_URL.format(file_id=file_id)
+    with http_get(logo_url, 10, stream=True) as resp:
+        if resp.status_code != 200:
+            reason = f"HTTP {resp.status_code}"
+        else:
+            raw = io.BytesIO()
+            _write_capped(resp, raw, LOGO_MAX_BYTES)
+            try:
+                img = Image.open(raw)
+                img.load()
+                reason = None
+            except Exception:
+                reason = "不是有效的圖片檔"
+    if reason:
+        if resp.status_code in (200, 403, 404):  # 暫時性錯誤 (逾時、5xx) 不記錄，下次再試
+            with open(bad_path, "w", encoding="utf-8") as f: f.write(reason)
+        raise RuntimeError(reason)
+
+    img = img.convert("RGBA")
+    img.thumbnail((LOGO_MAX_PX, LOGO_MAX_PX))
+    fd, tmp_path = tempfile.mkstemp(dir=LOGO_STORE_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        img.save(f, "PNG", optimize=True)
+    os.replace(tmp_path, png_path)
+    return png_path
+
+def render_audio_player(path, coordinates):
+    """分享頁專用播放器：沿用 controlsList="nodownload"，音源改走 /media 端點，第一段資料到達即可播放"""
+    from streamlit import runtime
+    if not runtime.exists():
+        st.audio(path, format="audio/mpeg")
+        return
+    media_url = runtime.get_instance().media_file_mgr.add(path, "audio/mpeg", coordinates)
+    st.markdown(f'<audio controls controlsList="nodownload" preload="metadata" style="width:100%;"><source src="{media_url}" type="audio/mpeg"></audio>', unsafe_allow_html=True)
 
 def get_embed_url(link):
     if "drive.google.com" in link and "/view" in link:
@@ -43,44 +464,583 @@ def get_embed_url(link):
     return link
 
 # === 3. 資料載入與過濾核心 ===
-@st.cache_data(ttl=60)
-def load_data():
+# 💡 總資料庫快照：df 供搜尋列表使用，by_uid 為 uid → 精簡列資料的索引，查詢單筆一律 O(1)；search_index 為關鍵字倒排索引；
+#    share_map 為對外分享頁專用的 uid → ShareEntry 精簡對照表；facets 為分類/類型過濾的預算遮罩與筆數
+#    所有 session 共用同一份唯讀快照，不必每次 rerun 反序列化整張表 (請勿就地修改)
+Catalogue = namedtuple("Catalogue", ["df", "by_uid", "search_index", "share_map", "facets"])
+ShareEntry = namedtuple("ShareEntry", ["short", "link", "shareable"])
+CATALOGUE_COLUMNS = ['uid', 'title', 'link', 'category', 'type', 'short', 'media_kind', 'share_block', 'pack_video']
+MEDIA_KINDS = ['audio', 'video', 'image', 'page']
+
+def _contains_any(series, words):
+    return series.str.contains("|".join(re.escape(w) for w in words), regex=True)
+
+def classify_media(df):
+    """資料載入時一次向量化判斷媒體種類，各畫面與 PPTX 排版直接讀欄位，不再逐列比對字串"""
+    t_low = df['title'].astype(str).str.lower()
+    tp_low = df['type'].astype(str).str.lower()
+    link_clean = df['link'].astype(str).str.split('?').str[0].str.lower()
+    title_clean = t_low.str.replace(" ", "", regex=False)
+    type_clean = tp_low.str.replace(" ", "", regex=False)
+
+    is_audio = _contains_any(t_low, ['.mp3', '.wav', '.m4a']) | tp_low.str.contains("企頻", regex=False)
+    is_video = _contains_any(tp_low, ["新鮮視", "側帶", "demo"]) | _contains_any(t_low, ['.mp4', '.mov'])
+    is_image = _contains_any(t_low, ['.jpg', '.jpeg', '.png', '.gif', '.webp'])
+
+    # media_kind：搜尋列表的預覽方式 (音訊優先，其次影片、圖片，其餘以內嵌網頁預覽)
+    df['media_kind'] = pd.Categorical(np.select([is_audio, is_video, is_image], MEDIA_KINDS[:3], MEDIA_KINDS[3]), categories=MEDIA_KINDS)
+    # share_block：對外分享頁的版權封鎖理由，空字串代表可對外試聽
+    df['share_block'] = pd.Categorical(np.select([is_video, is_image], ['video', 'image'], ''), categories=['', 'video', 'image'])
+    # pack_video：戰情台與 PPTX 的影音雙軌分流，連結副檔名優先，其次才看標題/類型關鍵字
+    is_explicit_audio = _contains_any(link_clean, ['.mp3', '.m4a', '.wav'])
+    is_explicit_video = _contains_any(link_clean, ['.mp4', '.mov', '.avi'])
+    is_keyword_video = _contains_any(title_clean, ['新鮮視', '側帶']) | _contains_any(type_clean, ['新鮮視', '側帶'])
+    df['pack_video'] = ~is_explicit_audio & (is_explicit_video | is_keyword_video)
+    return df
+
+# 💡 關鍵字倒排索引：以「單字 + 相鄰雙字」切分 (中文無空白分詞也適用，如 全家 / 新鮮視)，各欄位分開建索引以便依命中欄位排序
+SearchIndex = namedtuple("SearchIndex", ["texts", "postings"])
+SEARCH_FIELD_WEIGHTS = {'title': 3, 'short': 2, 'category': 1}
+
+def _sorted_unique(a):
+    # np.unique 在大陣列上偏慢，改用排序後去除相鄰重複
+    a = np.sort(a)
+    return a[np.r_[True, a[1:] != a[:-1]]] if len(a) else a
+
+def build_search_index(df):
+    """以向量化字串切片一次取出所有單字與雙字，依長度排序後每輪只切仍夠長的前段，不逐列跑 Python 迴圈"""
+    texts, postings = {}, {}
+    n = len(df)
+    for field in SEARCH_FIELD_WEIGHTS:
+        col = df[field].astype(str).str.lower()
+        texts[field] = col.to_numpy(dtype=object)
+        lens = col.str.len().to_numpy()
+        order = np.argsort(-lens, kind='stable')
+        col_sorted, neg_lens = col.iloc[order].reset_index(drop=True), -lens[order]
+        gram_parts, row_parts = [], []
+        for k in range(int(lens.max()) if n else 0):
+            alive = np.searchsorted(neg_lens, -k, side='left')      # 長度 > k 的列數
+            paired = np.searchsorted(neg_lens, -(k + 1), side='left')  # 長度 > k+1 的列數
+            gram_parts += [col_sorted[:alive].str.slice(k, k + 1), col_sorted[:paired].str.slice(k, k + 2)]
+            row_parts += [order[:alive], order[:paired]]
+        if not gram_parts:
+            postings[field] = {}
+            continue
+        codes, uniques = pd.factorize(pd.concat(gram_parts, ignore_index=True))
+        keys = _sorted_unique(codes.astype(np.int64) * n + np.concatenate(row_parts))
+        codes, rows = keys // n, (keys % n).astype(np.int32)
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        postings[field] = dict(zip(np.asarray(uniques)[codes[np.r_[0, bounds]]], np.split(rows, bounds)))
+    return SearchIndex(texts, postings)
+
+def _intersect_rows(small, large, n):
+    # 以長度 n 的布林遮罩取交集，不必像 np.intersect1d 重新排序；small 的順序原樣保留
+    mask = np.zeros(n, dtype=bool)
+    mask[large] = True
+    return small[mask[small]]
+
+def _field_candidates(index, field, term):
+    # 雙字倒排的交集：短詞 (<= 2 字) 即是答案，長詞只是候選，還要 _confirm_hits 確認完整出現
+    postings, n = index.postings[field], len(index.texts[field])
+    grams = [term] if len(term) <= 2 else [term[i:i + 2] for i in range(len(term) - 1)]
+    hits = None
+    for g in sorted(set(grams), key=lambda g: len(postings.get(g, ()))):
+        posting = postings.get(g)
+        if posting is None: return np.empty(0, dtype=np.int32)
+        hits = posting if hits is None else _intersect_rows(hits, posting, n)
+        if len(hits) == 0: return hits
+    return hits
+
+def _confirm_hits(index, field, term, rows):
+    if len(term) <= 2: return rows
+    return rows[np.fromiter((term in t for t in index.texts[field][rows]), dtype=bool, count=len(rows))]
+
+@instrumented("search_catalogue")
+def search_catalogue(index, query):
+    """多關鍵字 (空白分隔) 須全部命中，回傳依相關度排序的列位置；輸入當一般文字處理，不會被當成正規表示式"""
+    terms = query.lower().split()
+    if not terms: return np.empty(0, dtype=np.int32)
+    candidates = {term: {f: _field_candidates(index, f, term) for f in SEARCH_FIELD_WEIGHTS} for term in set(terms)}
+    # 候選最少的詞先算，之後的詞只在仍命中的列裡逐列確認，熱門長詞不必掃過全部候選
+    terms.sort(key=lambda term: sum(len(rows) for rows in candidates[term].values()))
+    n = len(next(iter(index.texts.values())))
+    matched, scores = None, np.zeros(n, dtype=np.int64)
+    for term in terms:
+        term_mask = np.zeros(n, dtype=bool)
+        for f, rows in candidates[term].items():
+            if matched is not None: rows = rows[matched[rows]]
+            rows = _confirm_hits(index, f, term, rows)
+            term_mask[rows] = True
+            scores[rows] += SEARCH_FIELD_WEIGHTS[f]
+        matched = term_mask if matched is None else matched & term_mask
+        if not matched.any(): break
+    rows = np.flatnonzero(matched).astype(np.int32)
+    return rows[np.argsort(-scores[rows], kind='stable')]
+
+# 💡 分類 / 類型過濾的布林遮罩與各選項筆數：試算表更新時算一次，過濾只剩幾次陣列 AND
+Facets = namedtuple("Facets", ["categories", "category_masks", "category_counts", "type_masks", "type_counts"])
+TYPE_FILTERS = ["企頻", "新鮮視", "側帶", "demo"]
+
+def build_facets(df):
+    n = len(df)
+    codes, uniques = pd.factorize(df['category'].astype(str))
+    category_masks = {name: codes == i for i, name in enumerate(uniques) if name.strip()}
+    type_masks = {t: (df['type'].astype(str).str.contains(t, case=False, regex=False)
+                      | df['title'].astype(str).str.contains(t, case=False, regex=False)).to_numpy() for t in TYPE_FILTERS}
+    category_counts = {'全部': n, **{name: int(np.count_nonzero(m)) for name, m in category_masks.items()}}
+    type_counts = {'全部': n, **{t: int(np.count_nonzero(m)) for t, m in type_masks.items()}}
+    return Facets(sorted(category_masks), category_masks, category_counts, type_masks, type_counts)
+
+@instrumented("search_filter")
+def filter_catalogue(catalogue, search_query, sel_cat, type_filter):
+    """搜尋列表的完整過濾：分類、類型，再加上關鍵字 (有關鍵字時依相關度排序)"""
+    df, facets = catalogue.df, catalogue.facets
+    mask = np.ones(len(df), dtype=bool)
+    if sel_cat != "全部":
+        mask &= facets.category_masks.get(sel_cat, False)
+    if type_filter != "全部":
+        mask &= facets.type_masks.get(type_filter, False)
+
+    if search_query.strip():
+        # 倒排索引已依相關度排序，再套用分類/類型過濾
+        ranked = search_catalogue(catalogue.search_index, search_query)
+        return df.iloc[ranked[mask[ranked]]]
+    return df[mask]
+
+# 💡 試算表同步層：帶 ETag/Last-Modified 條件請求，原始內容雜湊未變就不重新解析；
+#    有變動時只替新增或修改的列重算衍生欄位，連線失敗則沿用最後一份成功的快照
+RAW_COLUMNS = ['title', 'link', 'category', 'type', 'short']
+DERIVED_COLUMNS = ['short', 'uid', 'media_kind', 'share_block', 'pack_video']
+
+@st.cache_resource
+def _sheet_cache():
+    return {'lock': threading.Lock(), 'entries': {}}
+
+def _sheet_entry(url):
+    cache = _sheet_cache()
+    with cache['lock']:
+        entry = cache['entries'].get(url)
+        if entry is None:
+            entry = cache['entries'][url] = {
+                'lock': threading.Lock(), 'snapshot': None, 'derived': None,
+                'etag': None, 'last_modified': None, 'digest': None,
+                'checked_at': 0.0, 'synced_at': None, 'built_at': None,
+                'refresh_count': 0, 'last_duration': None, 'last_error': None,
+            }
+            # 冷啟動先讀回本機快照；checked_at 維持 0，下一輪同步會帶 ETag 回源確認 (多半是 304)
+            entry.update(restore_sheet_snapshot(url) or {})
+        return entry
+
+def _read_sheet_csv(raw):
+    # C 解析器比 engine='python' 快一個量級，遇到格式異常才退回 python 解析器
+    try:
+        df = pd.read_csv(io.BytesIO(raw), on_bad_lines='skip')
+    except pd.errors.ParserError:
+        df = pd.read_csv(io.BytesIO(raw), on_bad_lines='skip', engine='python')
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+def _refresh_sheet(entry, url, build):
+    headers = {}
+    if entry['etag']: headers['If-None-Match'] = entry['etag']
+    if entry['last_modified']: headers['If-Modified-Since'] = entry['last_modified']
+    with http_get(url, 15, headers=headers, interactive=True) as resp:
+        raw = resp.content
+    if resp.status_code == 304 and entry['snapshot'] is not None:
+        count_metric("sheet_not_modified")
+        return
+    if resp.status_code != 200:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    # ETag/Last-Modified 等快照換上後才記下：解析失敗時下次仍會完整下載重試，不會被 304 卡在舊快照
+    validators = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+    count_metric("download_bytes", len(raw))
+    digest = hashlib.sha1(raw).hexdigest()
+    if digest == entry['digest'] and entry['snapshot'] is not None:
+        entry['etag'], entry['last_modified'] = validators
+        count_metric("sheet_unchanged")
+        return
+    count_metric("sheet_rebuilt")
+    snapshot, entry['derived'] = build(raw, entry['derived'])
+    entry['snapshot'] = snapshot  # 整份替換，讀取端拿到的永遠是完整的新或舊快照
+    entry['digest'], entry['built_at'] = digest, time.time()
+    entry['etag'], entry['last_modified'] = validators
     try:
-        df = pd.read_csv(CSV_URL, on_bad_lines='skip', engine='python')
-        df.columns = [str(c).strip().lower() for c in df.columns]
-        for col in ['title', 'link', 'category', 'type', 'short']:
-            if col not in df.columns: df[col] = ""
-        df = df.fillna("")
-        df['short'] = df.apply(lambda r: r['short'] if str(r['short']).strip() != "" else r['title'], axis=1)
-        df = df[~df['category'].astype(str).str.contains("案例資料庫", na=False)]
-        df = df[~df['link'].astype(str).str.contains('/folders/')]
-        df['uid'] = df['link'].apply(generate_id)
-        return df.reset_index(drop=True)
-    except:
-        return pd.DataFrame()
-
-@st.cache_data(ttl=60)
+        save_sheet_snapshot(url, entry)
+    except Exception:  # 快照只是加速冷啟動，寫檔失敗不影響這次同步
+        count_metric("snapshot_save_failed")
+
+@instrumented("refresh_sheet")
+def refresh_sheet(url, build, max_age=0):
+    """同步一次 url；max_age 秒內已有人檢查過就略過 (等鎖期間別的執行緒剛更新完)"""
+    entry = _sheet_entry(url)
+    with entry['lock']:
+        if entry['snapshot'] is not None and time.time() - entry['checked_at'] < max_age:
+            return entry
+        start = time.perf_counter()
+        try:
+            _refresh_sheet(entry, url, build)
+            entry['synced_at'], entry['last_error'] = time.time(), None
+        except Exception as e:
+            entry['last_error'] = f"{type(e).__name__}: {e}"
+        entry['checked_at'] = time.time()
+        entry['last_duration'] = time.perf_counter() - start
+        entry['refresh_count'] += 1
+    return entry
+
+def load_sheet(url, build, fallback):
+    """回傳 url 目前的快照；背景執行緒運作中或距上次檢查未滿 SHEET_REFRESH_SECS 就不連線，同步失敗時沿用最後一份成功的快照"""
+    entry = _sheet_entry(url)
+    if entry['snapshot'] is None or (not background_refresh_alive() and time.time() - entry['checked_at'] >= SHEET_REFRESH_SECS):
+        refresh_sheet(url, build, max_age=SHEET_REFRESH_SECS if entry['snapshot'] is not None else 5)
+    return entry['snapshot'] if entry['snapshot'] is not None else fallback
+
+@instrumented("build_catalogue")
+def build_catalogue(raw, prev_derived):
+    df = _read_sheet_csv(raw)
+    for col in RAW_COLUMNS:
+        if col not in df.columns: df[col] = ""
+    df = df.fillna("")
+    df = df[~df['category'].astype(str).str.contains("案例資料庫", na=False)]
+    df = df[~df['link'].astype(str).str.contains('/folders/')]
+    df = df.reset_index(drop=True)
+
+    # 以整列原始內容的雜湊比對上一版，只替新增或修改的列計算 short / uid / 媒體種類
+    row_keys = pd.util.hash_pandas_object(df[RAW_COLUMNS].astype(str), index=False).to_numpy()
+    fresh = ~np.isin(row_keys, prev_derived.index) if prev_derived is not None else np.ones(len(df), dtype=bool)
+    new = df[fresh].copy()
+    new['short'] = new['short'].where(new['short'].astype(str).str.strip() != "", new['title'])
+    new['uid'] = new['link'].map(generate_id)
+    new = classify_media(new).set_index(pd.Index(row_keys[fresh]))[DERIVED_COLUMNS]
+    derived = new if prev_derived is None else pd.concat([prev_derived, new])
+    derived = derived[~derived.index.duplicated()].reindex(_sorted_unique(row_keys))
+
+    aligned = derived.reindex(row_keys).reset_index(drop=True)
+    for col in DERIVED_COLUMNS:
+        df[col] = aligned[col]
+    return Catalogue(df, records_by_uid(df), build_search_index(df), build_share_map(df), build_facets(df)), derived
+
+def records_by_uid(df):
+    # 逐欄 tolist 再 zip 成 dict，比 to_dict('records') 快數倍
+    df = df.drop_duplicates('uid')
+    columns = [df[c].tolist() for c in CATALOGUE_COLUMNS]
+    return {r['uid']: r for r in (dict(zip(CATALOGUE_COLUMNS, values)) for values in zip(*columns))}
+
+def build_share_map(df):
+    # 只留分享頁用得到的三個值；受版權限制的 uid 也保留 (shareable=False)，分享頁才能顯示封鎖原因而不是登入畫面
+    df = df.drop_duplicates('uid')
+    return {uid: ShareEntry(short, link, block == '')
+            for uid, short, link, block in zip(df['uid'].tolist(), df['short'].tolist(), df['link'].tolist(), df['share_block'].tolist())}
+
+def build_logo_table(raw, _prev_derived):
+    logo_df = _read_sheet_csv(raw)
+
+    rename_dict = {}
+    for c in logo_df.columns:
+        if 'client' in c or '客戶' in c or '品名' in c or 'brand' in c:
+            rename_dict[c] = 'client_name'
+        if 'link' in c or '網址' in c or 'logo' in c:
+            rename_dict[c] = 'logo_link'
+        if 'category' in c or '分類' in c:
+            rename_dict[c] = 'category'
+
+    logo_df = logo_df.rename(columns=rename_dict)
+    if 'client_name' not in logo_df.columns and len(logo_df.columns) > 1:
+        logo_df.columns.values[1] = 'client_name'
+
+    logo_df = logo_df.fillna("")
+    if 'client_name' not in logo_df.columns: logo_df['client_name'] = ""
+    if 'logo_link' not in logo_df.columns: logo_df['logo_link'] = ""
+    return build_logo_table_index(logo_df), None
+
+# 💡 Logo 對照表：每次試算表更新時預先排好下拉選項、客戶名稱 → Drive 檔案 ID，並把客戶名稱建成 Aho-Corasick 自動機，
+#    第二階段比對案例標題只需掃過標題一次，與客戶數量無關
+LOGO_PLACEHOLDER = "請選擇確切客戶 Logo"
+LogoTable = namedtuple("LogoTable", ["df", "options", "option_index", "file_ids", "matcher"])
+
+def extract_drive_file_id(raw_url):
+    raw_url = str(raw_url)
+    if "/file/d/" in raw_url: return raw_url.split("/file/d/")[1].split("/")[0]
+    if "id=" in raw_url: return raw_url.split("id=")[1].split("&")[0]
+    return ""
+
+def build_logo_matcher(client_names):
+    """以客戶全名與去掉分類前綴的純名稱 (如「飲料_可口可樂」→「可口可樂」) 建 Aho-Corasick 自動機"""
+    goto, out = [{}], [None]  # out[node] = (比對長度, -客戶順序, 客戶名稱)，越大越優先
+    for order, client in enumerate(client_names):
+        for pattern in {client, client.split('_')[-1]}:
+            if not pattern: continue
+            node = 0
+            for ch in pattern:
+                if ch not in goto[node]:
+                    goto.append({})
+                    out.append(None)
+                    goto[node][ch] = len(goto) - 1
+                node = goto[node][ch]
+            candidate = (len(pattern), -order, client)
+            if out[node] is None or candidate > out[node]: out[node] = candidate
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for ch, child in goto[node].items():
+            f = fail[node]
+            while f and ch not in goto[f]: f = fail[f]
+            fail[child] = goto[f].get(ch, 0) if node else 0
+            # 繼承失敗鏈上的輸出，掃描時每個位置只需看目前節點
+            inherited = out[fail[child]]
+            if inherited is not None and (out[child] is None or inherited > out[child]): out[child] = inherited
+            queue.append(child)
+    return goto, fail, out
+
+def match_logo(matcher, title):
+    """回傳標題中出現的最長客戶名稱，同長度以試算表順序在前者優先；找不到回傳 None"""
+    goto, fail, out = matcher
+    node, best = 0, None
+    for ch in str(title):
+        while node and ch not in goto[node]: node = fail[node]
+        node = goto[node].get(ch, 0)
+        if out[node] is not None and (best is None or out[node] > best): best = out[node]
+    return best[2] if best else None
+
+def build_logo_table_index(logo_df):
+    client_names = list(dict.fromkeys(str(c) for c in logo_df['client_name']))
+    options = [LOGO_PLACEHOLDER] + sorted(client_names)
+    file_ids = {}
+    for client, link in zip(logo_df['client_name'].astype(str), logo_df['logo_link']):
+        file_ids.setdefault(client, extract_drive_file_id(link))
+    return LogoTable(logo_df, options, {name: i for i, name in enumerate(options)}, file_ids, build_logo_matcher(client_names))
+
+@instrumented("load_data")
+def load_data():
+    return load_sheet(CSV_URL, build_catalogue, Catalogue(pd.DataFrame(), {}, None, {}, None))
+
+@instrumented("load_logo_data")
 def load_logo_data():
+    return load_sheet(CSV_LOGO_URL, build_logo_table, build_logo_table_index(pd.DataFrame(columns=['category', 'client_name', 'logo_link'])))
+
+# 💡 Parquet 快照：每張試算表一個資料夾 (SNAPSHOT_DIR/<generate_id(url)>/)，meta.json 記錄版本、種類與同步標頭；
+#    先寫進暫存資料夾再整個換上，讀取端不會看到寫一半的檔案
+def _dump_catalogue(catalogue, derived, folder):
+    catalogue.df.to_parquet(os.path.join(folder, "table.parquet"), index=False)
+    derived.to_parquet(os.path.join(folder, "derived.parquet"))
+    fields, grams, rows = [], [], []
+    for field, postings in catalogue.search_index.postings.items():
+        fields += [field] * len(postings)
+        grams += list(postings.keys())
+        rows += list(postings.values())
+    pq.write_table(pa.table({
+        'field': pa.array(fields, pa.string()), 'gram': pa.array(grams, pa.string()),
+        'rows': pa.array(rows, pa.list_(pa.int32())),
+    }), os.path.join(folder, "postings.parquet"))
+
+def _load_catalogue(folder):
+    df = pd.read_parquet(os.path.join(folder, "table.parquet"))
+    derived = pd.read_parquet(os.path.join(folder, "derived.parquet"))
+    table = pq.read_table(os.path.join(folder, "postings.parquet"))
+    lists = table.column('rows').combine_chunks()
+    offsets = lists.offsets.to_numpy()
+    rows = np.split(lists.flatten().to_numpy(), offsets[1:-1] - offsets[0])
+    postings = {field: {} for field in SEARCH_FIELD_WEIGHTS}
+    for field, gram, posting in zip(table.column('field').to_pylist(), table.column('gram').to_pylist(), rows):
+        postings[field][gram] = posting
+    texts = {field: df[field].astype(str).str.lower().to_numpy(dtype=object) for field in SEARCH_FIELD_WEIGHTS}
+    return Catalogue(df, records_by_uid(df), SearchIndex(texts, postings), build_share_map(df), build_facets(df)), derived
+
+def _dump_logo_table(logo_table, _derived, folder):
+    logo_table.df.to_parquet(os.path.join(folder, "table.parquet"), index=False)
+
+def _load_logo_table(folder):
+    return build_logo_table_index(pd.read_parquet(os.path.join(folder, "table.parquet"))), None
+
+SNAPSHOT_CODECS = {'Catalogue': (_dump_catalogue, _load_catalogue), 'LogoTable': (_dump_logo_table, _load_logo_table)}
+
+def save_sheet_snapshot(url, entry):
+    kind = type(entry['snapshot']).__name__  # rerun 會重新定義 namedtuple，以名稱判斷種類
+    folder = os.path.join(SNAPSHOT_DIR, generate_id(url))
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=SNAPSHOT_DIR)
     try:
-        logo_df = pd.read_csv(CSV_LOGO_URL, on_bad_lines='skip', engine='python')
-        logo_df.columns = [str(c).strip().lower() for c in logo_df.columns]
-        
-        rename_dict = {}
-        for c in logo_df.columns:
-            if 'client' in c or '客戶' in c or '品名' in c or 'brand' in c:
-                rename_dict[c] = 'client_name'
-            if 'link' in c or '網址' in c or 'logo' in c:
-                rename_dict[c] = 'logo_link'
-            if 'category' in c or '分類' in c:
-                rename_dict[c] = 'category'
-                
-        logo_df = logo_df.rename(columns=rename_dict)
-        if 'client_name' not in logo_df.columns and len(logo_df.columns) > 1:
-            logo_df.columns.values[1] = 'client_name'
-            
-        return logo_df.fillna("")
-    except:
-        return pd.DataFrame(columns=['category', 'client_name', 'logo_link'])
+        SNAPSHOT_CODECS[kind][0](entry['snapshot'], entry['derived'], tmp_dir)
+        meta = {'schema': SNAPSHOT_SCHEMA_VERSION, 'kind': kind, 'url': url, 'etag': entry['etag'],
+                'last_modified': entry['last_modified'], 'digest': entry['digest'],
+                'built_at': entry['built_at'], 'synced_at': time.time()}
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        old_dir = folder + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.isdir(folder): os.rename(folder, old_dir)
+        os.rename(tmp_dir, folder)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+@instrumented("snapshot_restore")
+def restore_sheet_snapshot(url):
+    """讀回 url 的本機快照，回傳要併入同步狀態的欄位；沒有快照、版本不符或檔案損毀時回傳 None"""
+    folder = os.path.join(SNAPSHOT_DIR, generate_id(url))
+    try:
+        with open(os.path.join(folder, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get('schema') != SNAPSHOT_SCHEMA_VERSION or meta.get('url') != url or meta.get('kind') not in SNAPSHOT_CODECS:
+            return None
+        snapshot, derived = SNAPSHOT_CODECS[meta['kind']][1](folder)
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        return None
+    count_metric("snapshot_restored")
+    return {'snapshot': snapshot, 'derived': derived, 'etag': meta['etag'], 'last_modified': meta['last_modified'],
+            'digest': meta['digest'], 'built_at': meta['built_at'], 'synced_at': meta['synced_at']}
+
+# 💡 背景同步執行緒與熱門案例統計 (整個行程只啟動一次)
+@st.cache_resource
+def _selection_stats():
+    return {'lock': threading.Lock(), 'counts': Counter()}
+
+def record_selection(uid):
+    stats = _selection_stats()
+    with stats['lock']:
+        stats['counts'][uid] += 1
+
+def prewarm_popular_media():
+    catalogue = _sheet_entry(CSV_URL)['snapshot']
+    if catalogue is None: return 0
+    stats = _selection_stats()
+    with stats['lock']:
+        top_uids = [uid for uid, _ in stats['counts'].most_common(PREWARM_TOP_N)]
+    warmed = 0
+    for uid in top_uids:
+        row = catalogue.by_uid.get(uid)
+        if row is None or not row['link'] or not (row['media_kind'] == 'audio' or row['pack_video']): continue
+        try:
+            get_cached_media(row['link'])
+            warmed += 1
+        except Exception: pass
+    return warmed
+
+def prewarm_logo_assets():
+    logo_table = _sheet_entry(CSV_LOGO_URL)['snapshot']
+    if logo_table is None: return 0
+    file_ids = {fid for fid in logo_table.file_ids.values() if fid}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda fid: _timed(get_logo_png, fid)[1] is None, file_ids))
+    return sum(results)
+
+def _prewarm_cycle(worker):
+    worker['prewarmed'] = prewarm_popular_media()
+    worker['logos_ready'] = prewarm_logo_assets()
+
+def _background_refresh_loop(worker):
+    while True:
+        start = time.perf_counter()
+        refresh_sheet(CSV_URL, build_catalogue)
+        refresh_sheet(CSV_LOGO_URL, build_logo_table)
+        worker['runs'] += 1
+        worker['last_cycle_secs'] = time.perf_counter() - start
+        worker['heartbeat'] = time.time()
+        try: write_metrics_file()
+        except OSError: pass
+        # 預熱可能一次下載數百 MB，交給預熱執行緒；上一輪還沒跑完就略過，不會越積越多
+        if worker['prewarm'] is None or worker['prewarm'].done():
+            worker['prewarm'] = worker['prewarm_pool'].submit(_prewarm_cycle, worker)
+        time.sleep(BACKGROUND_REFRESH_SECS * random.uniform(1 - BACKGROUND_REFRESH_JITTER, 1 + BACKGROUND_REFRESH_JITTER))
+
+@st.cache_resource
+def start_background_refresh():
+    worker = {'runs': 0, 'prewarmed': 0, 'logos_ready': 0, 'last_cycle_secs': None, 'heartbeat': None, 'started_at': time.time(),
+              'prewarm': None, 'prewarm_pool': ThreadPoolExecutor(max_workers=1, thread_name_prefix="swd-prewarm")}
+    worker['thread'] = threading.Thread(target=_background_refresh_loop, args=(worker,), name="swd-sheet-refresh", daemon=True)
+    worker['thread'].start()
+    _sheet_cache()['worker'] = worker
+    return worker
+
+def background_refresh_alive():
+    """背景同步執行緒還在跑、而且最近 BACKGROUND_STALE_SECS 內完成過一輪 (第一輪以啟動時間起算)"""
+    worker = _sheet_cache().get('worker')
+    if worker is None or not worker['thread'].is_alive(): return False
+    return time.time() - (worker['heartbeat'] or worker['started_at']) < BACKGROUND_STALE_SECS
+
+def refresh_metrics():
+    """各試算表的同步耗時與快照年齡 (秒)，供管理面板顯示"""
+    now = time.time()
+    rows = []
+    for name, url in (("總資料庫", CSV_URL), ("Clients Logo", CSV_LOGO_URL)):
+        entry = _sheet_entry(url)
+        rows.append({
+            '資料表': name,
+            '快照年齡(秒)': round(now - entry['synced_at'], 1) if entry['synced_at'] else None,
+            '內容更新於(秒前)': round(now - entry['built_at'], 1) if entry['built_at'] else None,
+            '上次同步耗時(秒)': round(entry['last_duration'], 3) if entry['last_duration'] is not None else None,
+            '同步次數': entry['refresh_count'],
+            '最近錯誤': entry['last_error'] or "",
+        })
+    return rows
+
+@st.cache_resource
+def _session_registry():
+    return {'lock': threading.Lock(), 'sessions': {}}
+
+def _state_value_bytes(value):
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+def record_session_usage():
+    """估算本 session 的 session_state 大小 (以 pickle 長度計) 並登記，供管理面板估算副本容量"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None: return
+    now = time.time()
+    registry = _session_registry()
+    with registry['lock']:
+        prev = registry['sessions'].get(ctx.session_id)
+        if prev and now - prev['sampled_at'] < SESSION_STATS_SAMPLE_SECS:
+            prev['last_seen'] = now
+            return
+    state = st.session_state
+    keys = list(state.keys())
+    usage = {
+        'keys': len(keys),
+        'row_keys': sum(1 for k in keys if str(k).startswith(ROW_WIDGET_PREFIXES)),
+        'bytes': sum(_state_value_bytes(state[k]) for k in keys),
+        'selected': len(state.get('selected_uids', ())),
+        'sampled_at': now,
+        'last_seen': now,
+    }
+    with registry['lock']:
+        registry['sessions'][ctx.session_id] = usage
+        for sid in [sid for sid, u in registry['sessions'].items() if usage['last_seen'] - u['last_seen'] > SESSION_STATS_TTL_SECS]:
+            del registry['sessions'][sid]
+
+def session_metrics():
+    """各 session 的記憶體估算，依用量由大到小"""
+    now = time.time()
+    registry = _session_registry()
+    with registry['lock']:
+        sessions = list(registry['sessions'].items())
+    rows = [{
+        'Session': sid[:8],
+        'session_state(KB)': round(u['bytes'] / 1024, 1),
+        '鍵數': u['keys'],
+        '逐列元件鍵': u['row_keys'],
+        '已挑選': u['selected'],
+        '閒置(秒)': round(now - u['last_seen']),
+        '取樣於(秒前)': round(now - u['sampled_at']),
+    } for sid, u in sessions]
+    return sorted(rows, key=lambda r: -r['session_state(KB)'])
+
+def deselect_uid(uid):
+    # 連同勾選框的狀態一起清掉，否則下一輪勾選框仍是打勾又把案例加回去
+    st.session_state.selected_uids.pop(uid, None)
+    st.session_state.pop(f"chk_{uid}", None)
+
+def prune_row_widget_keys(visible_uids):
+    # 💡 換頁或剔除後，不在畫面上的逐列元件鍵直接刪掉，session 只留得住目前看得到的列
+    for key in list(st.session_state.keys()):
+        key = str(key)
+        if key.startswith(ROW_WIDGET_PREFIXES) and key.split("_")[-1] not in visible_uids:
+            del st.session_state[key]
 
 # === 4. UI 元件 (複製功能核心) ===
 def render_copy_ui(label, text_to_copy, is_disabled=False, warning_msg=""):
@@ -120,7 +1080,457 @@ def show_share_dialog(display_name, link, uid, is_video=False, is_image=False):
         share_link = f"{SITE_URL}?id={uid}"
         render_copy_ui("🌏 外部分享連結 (客戶試聽/防下載)", share_link)
 
-# === 5. 主程式架構 ===
+@instrumented("share_page")
+def render_share_page(catalogue, target_uid):
+    """對外分享頁：只查 share_map，不載入 Logo 表也不碰登入後的狀態；uid 不存在時回傳 False 改走一般頁面"""
+    entry = catalogue.share_map.get(target_uid)
+    if entry is None: return False
+    if not entry.shareable:
+        st.error("此檔案涉及版權保護，不開放對外預覽。")
+        return True
+    st.subheader(f"🎵 作品預覽：{entry.short}")
+    audio_path = get_audio_path(entry.link)
+    if audio_path: render_audio_player(audio_path, f"share_audio.{target_uid}")
+    if st.button("🏠 回到首頁"): st.query_params.clear(); st.rerun()
+    return True
+
+@st.fragment(run_every=EXPORT_POLL_SECS)
+def render_export_progress(job_id):
+    # 💡 只有這個區塊定時重跑來刷新進度，完成後整頁重跑一次換成下載按鈕
+    job = get_export_job(job_id)
+    if job is None or job['status'] not in ('queued', 'running'):
+        st.rerun()
+    items = list(job['items'].values())
+    total = sum(1 for row in items for stage in EXPORT_STAGE_LABELS.values() if row[stage] != '—')
+    done = sum(1 for row in items for stage in EXPORT_STAGE_LABELS.values() if row[stage] in ('✅', '❌'))
+    if job['status'] == 'queued':
+        st.info(f"⏳ 簡報排隊中，前面還有 {export_jobs_ahead(job)} 份簡報正在封裝...")
+    st.progress(done / total if total else 0.0, text=f"🚀 {job['phase']}... ({done}/{total})")
+    st.dataframe(pd.DataFrame(items), hide_index=True, width="stretch")
+
+def render_export_result(job):
+    if job['status'] == 'failed':
+        st.error(f"❌ 簡報自動生成失敗，原因：{job['error']}")
+        return
+    for r in job['report']:
+        if r['狀態'] != '✅ 完成':
+            st.warning(f"⚠️ {r['案例']} 的{r['素材']}下載失敗，已略過：{r['狀態'].removeprefix('❌ ')}")
+    with st.expander(f"⏱️ 素材下載明細 (共 {len(job['report'])} 項，總耗時 {job['fetch_secs']:.1f} 秒)"):
+        st.dataframe(pd.DataFrame(job['report']), hide_index=True, width="stretch")
+
+    # 下載走自訂路由 /exports/<token>，由磁碟直接串流，不經過 Streamlit 的記憶體媒體檔；檔案逾時清除後不再給失效的連結
+    if not os.path.exists(_export_index_path(job['token'])):
+        st.info(f"⌛ 這份簡報已超過 {EXPORT_JOB_TTL_SECS // 60} 分鐘下載期限被清除，請重新產生")
+        return
+    st.link_button("💾 簡報封裝完畢！點此儲存 PPTX 檔案至電腦", f"exports/{job['token']}", width="stretch", type="primary")
+
+def render_admin_panel():
+    # 💡 只有管理員密碼登入才顯示：熱路徑計時、快取命中、外部主機耗時、同步與 session 用量
+    snap = telemetry_snapshot()
+    st.sidebar.markdown("### 🛠️ 管理員效能面板")
+    with st.sidebar.expander("⏱️ 熱路徑計時", expanded=True):
+        st.caption(f"行程已運作 {snap['uptime_secs'] / 60:.0f} 分鐘")
+        timer_rows = [{'項目': name, '次數': t['count'], '平均(ms)': t['avg_ms'], 'p95(ms)': t['p95_ms'], '最慢(ms)': t['max_ms']} for name, t in snap['timers'].items()]
+        st.dataframe(pd.DataFrame(timer_rows), hide_index=True)
+    with st.sidebar.expander("🔢 計數器"):
+        st.dataframe(pd.DataFrame([{'項目': k, '數值': v} for k, v in snap['counters'].items()]), hide_index=True)
+    with st.sidebar.expander("⚙️ 資料同步狀態"):
+        st.dataframe(pd.DataFrame(refresh_metrics()), hide_index=True)
+    with st.sidebar.expander("🧠 Session 記憶體用量"):
+        sessions = session_metrics()
+        total_kb = sum(r['session_state(KB)'] for r in sessions)
+        st.caption(f"活躍 session {len(sessions)} 個，session_state 合計約 {total_kb:.1f} KB (平均 {total_kb / max(1, len(sessions)):.1f} KB)")
+        st.dataframe(pd.DataFrame(sessions), hide_index=True)
+    c_json, c_prom = st.sidebar.columns(2)
+    with c_json:
+        st.download_button("📄 JSON", data=lambda: json.dumps(telemetry_snapshot(), ensure_ascii=False, indent=2), file_name="swd_metrics.json", mime="application/json", width="stretch", key="admin_metrics_json_btn")
+    with c_prom:
+        st.download_button("📈 Prometheus", data=telemetry_prometheus, file_name="swd_metrics.prom", mime="text/plain", width="stretch", key="admin_metrics_prom_btn")
+
+# === 5. 六宮格簡報素材下載與排版 ===
+@st.cache_resource
+def _content_digests():
+    """(路徑, inode, 大小) → 檔案內容 sha1，同一個快取檔只雜湊一次"""
+    return {}
+
+def file_digest(path):
+    st_info = os.stat(path)
+    key = (path, st_info.st_ino, st_info.st_size)
+    digests = _content_digests()
+    if key not in digests:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b""):
+                h.update(chunk)
+        digests[key] = h.hexdigest()
+    return digests[key]
+
+def _run_ffmpeg(args, out_path):
+    # 先輸出到同副檔名的暫存檔再換名，轉到一半失敗或逾時不會留下殘檔
+    fd, tmp_path = tempfile.mkstemp(dir=MEDIA_OPTIMIZED_DIR, suffix=os.path.splitext(out_path)[1])
+    os.close(fd)
+    try:
+        with timed_section("ffmpeg"):
+            subprocess.run([FFMPEG_BIN, "-y", "-v", "error", *args, tmp_path], check=True, capture_output=True, stdin=subprocess.DEVNULL, timeout=PACK_TRANSCODE_TIMEOUT)
+        os.replace(tmp_path, out_path)
+        return True
+    except (OSError, subprocess.SubprocessError):
+        try: os.unlink(tmp_path)
+        except OSError: pass
+        return False
+
+def optimize_pack_media(src_path, is_mp4):
+    """回傳 (簡報用影音路徑, 影片封面 PNG 路徑或 None)；沒有 ffmpeg 或轉檔失敗時沿用原檔"""
+    if not (PACK_OPTIMIZE_MEDIA and FFMPEG_BIN): return src_path, None
+    # 兩份簡報同時用到同一段影音時只轉檔一次
+    return single_flight(("optimize", src_path, is_mp4), _optimize_pack_media, src_path, is_mp4)
+
+def _optimize_pack_media(src_path, is_mp4):
+    os.makedirs(MEDIA_OPTIMIZED_DIR, exist_ok=True)
+    box_w, box_h = PACK_VIDEO_BOX
+    scale = f"scale={box_w}:{box_h}:force_original_aspect_ratio=decrease:force_divisible_by=2"
+    profile = f"v{box_w}x{box_h}" if is_mp4 else f"a{PACK_AUDIO_BITRATE}"
+    base = os.path.join(MEDIA_OPTIMIZED_DIR, f"{file_digest(src_path)}_{profile}")
+    out_path = base + ('.mp4' if is_mp4 else '.mp3')
+    poster_path = base + '.png' if is_mp4 else None
+    created = False
+
+    if os.path.exists(out_path):
+        os.utime(out_path)
+    else:
+        if is_mp4:
+            args = ["-i", src_path, "-vf", scale, "-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+                    "-c:a", "aac", "-b:a", PACK_AUDIO_BITRATE, "-movflags", "+faststart"]
+        else:
+            args = ["-i", src_path, "-vn", "-c:a", "libmp3lame", "-b:a", PACK_AUDIO_BITRATE]
+        if not _run_ffmpeg(args, out_path): return src_path, None
+        if os.path.getsize(out_path) >= os.path.getsize(src_path):
+            # 原檔本來就夠精簡：成品改成原檔的副本，下次直接命中不必再轉
+            shutil.copyfile(src_path, out_path)
+        created = True
+
+    if poster_path:
+        if os.path.exists(poster_path):
+            os.utime(poster_path)
+        elif _run_ffmpeg(["-i", src_path, "-vf", f"thumbnail,{scale}", "-frames:v", "1", "-update", "1"], poster_path):
+            created = True
+        else:
+            poster_path = None
+
+    if created:
+        with _media_cache_lock():
+            _evict_media_cache(keep=(src_path, out_path, poster_path))
+    return out_path, poster_path
+
+def _link_into(src_path, dst_path):
+    # 以硬連結放進本次排版目錄 (跨檔案系統才複製)，快取淘汰不會影響進行中的匯出
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copyfile(src_path, dst_path)
+    return dst_path
+
+def _fetch_media(link, is_mp4, work_dir):
+    # python-pptx 依副檔名決定媒體格式，以硬連結替快取檔換上 .mp4/.mp3 名稱，不必複製檔案
+    media_src, poster_src = optimize_pack_media(get_cached_media(link), is_mp4)
+    uid = generate_id(link)
+    media_path = _link_into(media_src, os.path.join(work_dir, uid + ('.mp4' if is_mp4 else '.mp3')))
+    poster_path = _link_into(poster_src, os.path.join(work_dir, uid + '.png')) if poster_src else None
+    return media_path, poster_path
+
+@st.cache_resource(ttl=24 * 3600)
+def static_asset_bytes(url):
+    """小喇叭圖示等固定素材整個行程共用一份；下載失敗直接拋出例外，不會被快取"""
+    with http_get(url, 5) as resp:
+        resp.raise_for_status()
+        return resp.content
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args), None, time.perf_counter() - start
+    except requests.RequestException as e:
+        return None, type(e).__name__, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e) or type(e).__name__, time.perf_counter() - start
+
+@instrumented("export_fetch")
+def fetch_pack_assets(final_pack_pairs, on_progress=None):
+    """併發下載所有案例的影音與 Logo，回傳 (各案例素材, 小喇叭圖示, 下載明細)；每項完成時呼叫 on_progress(uid, 素材種類, 錯誤)"""
+    os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="pack_", dir=MEDIA_CACHE_DIR)
+    assets = {uid: {'is_mp4': info['is_mp4'], 'media_path': None, 'poster_path': None, 'logo_path': None, 'work_dir': work_dir} for uid, info in final_pack_pairs.items()}
+    futures = []
+    with ThreadPoolExecutor(max_workers=PACK_FETCH_WORKERS) as pool:
+        icon_future = pool.submit(_timed, static_asset_bytes, DEFAULT_SPEAKER_ICON_URL)
+        for uid, info in final_pack_pairs.items():
+            if info['case_link']:
+                futures.append((uid, 'media', pool.submit(_timed, _fetch_media, info['case_link'], assets[uid]['is_mp4'], work_dir)))
+            if info.get('logo_file_id') and info['logo_name'] != LOGO_PLACEHOLDER:
+                futures.append((uid, 'logo', pool.submit(_timed, get_logo_png, info['logo_file_id'])))
+        if on_progress:
+            for uid, kind, future in futures:
+                future.add_done_callback(lambda f, uid=uid, kind=kind: on_progress(uid, kind, f.result()[1]))
+
+    report = []
+    for uid, kind, future in futures:
+        payload, error, secs = future.result()
+        if kind == 'media':
+            assets[uid]['media_path'], assets[uid]['poster_path'] = payload or (None, None)
+        else:
+            assets[uid]['logo_path'] = payload
+        report.append({
+            '案例': final_pack_pairs[uid]['case_title'],
+            '素材': '影音' if kind == 'media' else f"Logo ({final_pack_pairs[uid]['logo_name']})",
+            '秒數': round(secs, 2),
+            '狀態': '✅ 完成' if error is None else f"❌ {error}",
+        })
+    icon_bytes, icon_error, icon_secs = icon_future.result()
+    # 小喇叭圖示下載失敗時音訊改用 PowerPoint 預設封面，同樣列入明細
+    report.append({
+        '案例': '（共用素材）',
+        '素材': '音訊小喇叭圖示',
+        '秒數': round(icon_secs, 2),
+        '狀態': '✅ 完成' if icon_error is None else f"❌ {icon_error}",
+    })
+    return assets, icon_bytes, report
+
+@st.cache_resource
+def _deck_skeleton():
+    """16:9 空白簡報骨架與排好字型的大標題框 XML，整個行程只建一次"""
+    prs = Presentation()
+    prs.slide_width = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+
+    # 大標題設定 (在草稿簡報上排好後只留下 XML，骨架本身保持零張投影片才能安全深拷貝)
+    scratch = copy.deepcopy(prs)
+    slide = scratch.slides.add_slide(scratch.slide_layouts[6])
+    title_box = slide.shapes.add_textbox(Inches(0.6), Inches(0.4), Inches(12.133), Inches(1.0))
+    tf = title_box.text_frame
+    tf.word_wrap = True
+    p_title = tf.paragraphs[0]
+    p_title.font.size = Pt(36)
+    p_title.font.bold = True
+    p_title.font.name = "Microsoft JhengHei"
+    p_title.alignment = PP_ALIGN.CENTER
+    return prs, title_box._element
+
+def add_grid_slide(prs, ppt_title):
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    slide.shapes._spTree.insert_element_before(copy.deepcopy(_deck_skeleton()[1]), 'p:extLst')
+    slide.shapes[0].text_frame.paragraphs[0].text = str(ppt_title).strip()
+    return slide
+
+def new_pack_deck():
+    # 💡 深拷貝骨架 (約 2ms) 比每次重新載入預設範本快，各匯出之間互不影響
+    return copy.deepcopy(_deck_skeleton()[0])
+
+def add_section_slide(prs, section_title):
+    # 章節頁沿用大標題框，只是移到投影片正中央
+    slide = add_grid_slide(prs, section_title)
+    slide.shapes[0].top = Inches(3.25)
+    return slide
+
+def _place_pack_case(slide, idx, info, asset, icon_bytes):
+    x_coords = [Inches(0.6), Inches(4.8), Inches(9.0)]
+    y_coords = [Inches(2.0), Inches(4.7)]
+    row_idx, col_idx = idx // 3, idx % 3
+    current_x, current_y = x_coords[col_idx], y_coords[row_idx]
+    is_mp4 = asset['is_mp4']
+
+    text_box = slide.shapes.add_textbox(current_x, current_y, Inches(3.8), Inches(0.5))
+    text_box.text_frame.word_wrap = True
+    p_case = text_box.text_frame.paragraphs[0]
+    p_case.text = f"🔹 {info['case_title']}"
+    p_case.font.size = Pt(11)
+    p_case.font.name = "Microsoft JhengHei"
+
+    if asset['media_path']:
+        if is_mp4:
+            slide.shapes.add_movie(
+                asset['media_path'],
+                current_x + Inches(0.2),
+                current_y + Inches(0.65),
+                width=Inches(1.4),
+                height=Inches(1.0),
+                poster_frame_image=asset.get('poster_path'),
+                mime_type='video/mp4'
+            )
+        else:
+            poster_stream = io.BytesIO(icon_bytes) if icon_bytes else None
+            slide.shapes.add_movie(
+                asset['media_path'],
+                current_x + Inches(0.2),
+                current_y + Inches(0.7),
+                width=Inches(0.5),
+                height=Inches(0.5),
+                poster_frame_image=poster_stream,
+                mime_type='audio/mpeg'
+            )
+
+    # 嵌入去背品牌 Logo
+    if asset['logo_path']:
+        x_offset = Inches(1.8) if is_mp4 else Inches(1.0)
+        slide.shapes.add_picture(
+            asset['logo_path'],
+            current_x + x_offset,
+            current_y + Inches(0.65),
+            width=Inches(1.6)
+        )
+
+def _media_placeholder(uid, asset):
+    # 內容含 uid 的小檔案，python-pptx 以內容雜湊去重，不同案例的佔位檔才不會被合併；副檔名沿用真檔決定媒體格式
+    path = os.path.join(asset['work_dir'], f"placeholder_{uid}{os.path.splitext(asset['media_path'])[1]}")
+    with open(path, "wb") as f:
+        f.write(PACK_PLACEHOLDER_MAGIC + uid.encode())
+    return path
+
+def _swap_placeholders(draft, out_file, real_media):
+    """逐一複製草稿裡的 zip 項目，遇到佔位影音就改寫入本機快取檔 (分段串流，不整支讀進記憶體)"""
+    with zipfile.ZipFile(draft) as zin, zipfile.ZipFile(out_file, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            real_path = None
+            if info.filename.startswith("ppt/media/") and info.file_size < 256:
+                real_path = real_media.get(zin.read(info))
+            if real_path:
+                # 影音本身已壓縮過，直接存放省下再壓一次的時間
+                zout.write(real_path, info.filename, compress_type=zipfile.ZIP_STORED)
+            else:
+                with zin.open(info) as src, zout.open(info, "w") as dst:
+                    shutil.copyfileobj(src, dst, DOWNLOAD_CHUNK_BYTES)
+
+@instrumented("export_build")
+def build_pack_deck(ppt_title, final_pack_pairs, assets, icon_bytes, out_file, on_progress=None, group_by_category=False):
+    """依挑選順序每 6 個案例排成一張 3x2 六宮格 (可依分類加章節頁)，把 PPTX 寫入 out_file (路徑或檔案物件)；每排好一格呼叫 on_progress(uid, 'pack', None)"""
+    ppt_title = str(ppt_title).strip()
+    prs = new_pack_deck()
+    real_media = {}
+
+    sections = {}
+    for uid, info in final_pack_pairs.items():
+        sections.setdefault((info.get('category') or '未分類') if group_by_category else None, []).append(uid)
+
+    for section, uids in sections.items():
+        if section is not None: add_section_slide(prs, section)
+        pages = [uids[i:i + PACK_GRID_SIZE] for i in range(0, len(uids), PACK_GRID_SIZE)]
+        for page_no, page_uids in enumerate(pages, 1):
+            slide_title = ppt_title if section is None else f"{ppt_title}｜{section}"
+            if len(pages) > 1: slide_title += f" ({page_no}/{len(pages)})"
+            slide = add_grid_slide(prs, slide_title)
+            for idx, uid in enumerate(page_uids):
+                asset = assets[uid]
+                if asset['media_path']:
+                    placeholder = _media_placeholder(uid, asset)
+                    real_media[PACK_PLACEHOLDER_MAGIC + uid.encode()] = asset['media_path']
+                    asset = dict(asset, media_path=placeholder)
+                _place_pack_case(slide, idx, final_pack_pairs[uid], asset, icon_bytes)
+                if on_progress: on_progress(uid, 'pack', None)
+
+    # 草稿只含文字、Logo 與佔位檔，通常幾百 KB，放在記憶體即可
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as draft:
+        prs.save(draft)
+        _swap_placeholders(draft, out_file, real_media)
+
+def cleanup_pack_assets(assets):
+    # 只移除本次排版的硬連結目錄，快取本體保留給下一次匯出與試聽
+    for work_dir in {a['work_dir'] for a in assets.values()}:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# 💡 背景匯出工作：按鈕只負責送件並把工作 ID 記在 session_state，重新整理或操作其他元件都不會中斷封裝
+EXPORT_STAGE_LABELS = {'media': '影音', 'logo': 'Logo', 'pack': '排版'}
+
+@st.cache_resource
+def _export_queue():
+    """全行程共用的匯出佇列：有上限的執行緒池 + 以工作 ID 索引的工作表"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    sweep_export_dir(time.time())  # 上一個行程留下的過期簡報
+    return {'lock': threading.Lock(), 'pool': ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="pptx_export"), 'jobs': {}}
+
+def _export_index_path(token):
+    return os.path.join(EXPORT_DIR, f"{token}.json")
+
+def sweep_export_dir(now):
+    # 依 mtime 逐檔清掉逾時的簡報與下載索引；不整個刪目錄，下載路由與其他工作可能正在讀取
+    try: names = os.listdir(EXPORT_DIR)
+    except OSError: return
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_JOB_TTL_SECS: os.unlink(path)
+        except OSError: pass
+
+def _run_export_job(job, ppt_title, final_pack_pairs, group_by_category):
+    def on_progress(uid, stage, error):
+        job['items'][uid][EXPORT_STAGE_LABELS[stage]] = '✅' if error is None else '❌'
+
+    job['status'], job['started_at'] = 'running', time.time()
+    assets = {}
+    try:
+        job['phase'] = '下載素材'
+        fetch_start = time.perf_counter()
+        assets, icon_bytes, job['report'] = fetch_pack_assets(final_pack_pairs, on_progress)
+        job['fetch_secs'] = time.perf_counter() - fetch_start
+        job['phase'] = '排版封裝'
+        out_path = os.path.join(EXPORT_DIR, f"{job['id']}.pptx")
+        build_pack_deck(ppt_title, final_pack_pairs, assets, icon_bytes, out_path, on_progress, group_by_category)
+        # 下載路由只認磁碟上的 token 索引：ASGI 模式下路由所在的 app 模組與執行頁面的 __main__ 各有一份 cache_resource
+        _write_cache_meta(_export_index_path(job['token']), {'path': out_path, 'file_name': job['file_name'], 'finished_at': time.time()})
+        job['path'], job['status'] = out_path, 'done'
+        count_metric("export_done")
+    except Exception as e:
+        job['error'], job['status'] = str(e), 'failed'
+        count_metric("export_failed")
+        try: os.unlink(os.path.join(EXPORT_DIR, f"{job['id']}.pptx"))
+        except OSError: pass
+    finally:
+        cleanup_pack_assets(assets)
+        job['finished_at'] = time.time()
+
+def submit_export_job(ppt_title, final_pack_pairs, group_by_category=False):
+    """把一份簡報送進背景佇列，回傳工作 ID"""
+    queue = _export_queue()
+    now = time.time()
+    items = {}
+    for uid, info in final_pack_pairs.items():
+        has_logo = bool(info.get('logo_file_id')) and info['logo_name'] != LOGO_PLACEHOLDER
+        items[uid] = {'案例': info['case_title'], '影音': '⏳' if info['case_link'] else '—', 'Logo': '⏳' if has_logo else '—', '排版': '⏳'}
+    job = {
+        'id': f"{int(now * 1000):x}{random.randrange(16 ** 4):04x}", 'token': secrets.token_urlsafe(18), 'status': 'queued', 'phase': '排隊中',
+        'items': items, 'report': [], 'fetch_secs': 0.0, 'path': None, 'error': None,
+        'file_name': f"媒體通路提案簡報_{datetime.now().strftime('%Y%m%d')}.pptx",
+        'created_at': now, 'started_at': None, 'finished_at': None,
+    }
+    with queue['lock']:
+        # 順手清掉逾時的已完成工作與簡報檔，避免長期佔用磁碟
+        for job_id in [k for k, j in queue['jobs'].items() if j['finished_at'] and now - j['finished_at'] > EXPORT_JOB_TTL_SECS]:
+            del queue['jobs'][job_id]
+        queue['jobs'][job['id']] = job
+    sweep_export_dir(now)
+    count_metric("export_submitted")
+    queue['pool'].submit(_run_export_job, job, ppt_title, dict(final_pack_pairs), group_by_category)
+    return job['id']
+
+# 💡 完成的簡報由 /exports/<token> 路由以 FileResponse 分段讀檔送出，再大的簡報下載時也不會整份讀進記憶體；
+#    token 是隨機字串，只有送出這份簡報的 session 拿得到，逾時清除後連結即失效。
+#    路由只讀 EXPORT_DIR 裡的 <token>.json，不碰匯出佇列 (見 _run_export_job)
+PPTX_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+async def export_download(request):
+    token = request.path_params['token']
+    entry = _read_cache_meta(_export_index_path(token)) if re.fullmatch(r"[\w-]+", token) else None
+    if not entry or time.time() - entry['finished_at'] > EXPORT_JOB_TTL_SECS or not os.path.exists(entry['path']):
+        return PlainTextResponse("簡報不存在或已過期，請重新產生", status_code=404)
+    return FileResponse(entry['path'], media_type=PPTX_MIME, filename=entry['file_name'])
+
+def get_export_job(job_id):
+    return _export_queue()['jobs'].get(job_id)
+
+def export_jobs_ahead(job):
+    # 比這份更早送出、仍在排隊或執行中的工作數
+    jobs = list(_export_queue()['jobs'].values())
+    return sum(1 for j in jobs if j['status'] in ('queued', 'running') and j['created_at'] < job['created_at'])
+
+# === 6. 主程式架構 ===
 def main():
     st.set_page_config(page_title="全家通路媒體資料庫", layout="centered")
     
@@ -132,51 +1542,51 @@ def main():
         }
         </style>
     """, unsafe_allow_html=True)
-    
+
+    # 💡 分享連結 (?id=<uid>) 走輕量路徑：只需總資料庫快照，Logo 表與登入後的 session 狀態都不碰
+    start_background_refresh()
+    catalogue = load_data()
+    target_uid = st.query_params.get("id", None)
+    if target_uid and render_share_page(catalogue, target_uid):
+        return
+
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
-    if 'display_count' not in st.session_state:
-        st.session_state.display_count = 20
+    if 'result_page' not in st.session_state:
+        st.session_state.result_page = 0
     if 'selected_uids' not in st.session_state:
-        st.session_state.selected_uids = []
+        st.session_state.selected_uids = {}  # 💡 以 dict 當有序集合：保留挑選順序，成員判斷 O(1)
     if 'confirmed_stage' not in st.session_state:
         st.session_state.confirmed_stage = False
+    if 'export_job_id' not in st.session_state:
+        st.session_state.export_job_id = None
+    if 'batch_mode' not in st.session_state:
+        st.session_state.batch_mode = False
+    record_session_usage()
 
-    df = load_data()
-    logo_df = load_logo_data()
+    df = catalogue.df
+    logo_table = load_logo_data()
     
     if df.empty:
         st.error("目前無法連線至總資料庫，請檢查發布設定。")
         return
 
-    params = st.query_params
-    target_uid = params.get("id", None)
-
-    if target_uid:
-        target_row = df[df['uid'] == target_uid]
-        if not target_row.empty:
-            item = target_row.iloc[0]
-            t_low, tp_low = str(item['title']).lower(), str(item['type']).lower()
-            is_vid = any(x in tp_low for x in ["新鮮視", "側帶", "demo"]) or any(ext in t_low for ext in ['.mp4', '.mov'])
-            is_img = any(ext in t_low for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp'])
-            if is_vid or is_img:
-                st.error("此檔案涉及版權保護，不開放對外預覽。")
-                return
-            st.subheader(f"🎵 作品預覽：{item['short']}")
-            b64 = get_audio_base64(item['link'])
-            if b64: st.markdown(f'<audio controls controlsList="nodownload" style="width:100%;"><source src="{b64}" type="audio/mpeg"></audio>', unsafe_allow_html=True)
-            if st.button("🏠 回到首頁"): st.query_params.clear(); st.rerun()
-            return
-
     if not st.session_state.logged_in:
         st.markdown("<h2 style='text-align: center;'>🔒 全家通路媒體資料庫</h2>", unsafe_allow_html=True)
         with st.form("login_form"):
             pw = st.text_input("請輸入內部資料庫密碼", type="password")
-            if st.form_submit_button("解鎖系統", use_container_width=True):
-                if pw == PASSWORD: st.session_state.logged_in = True; st.rerun()
+            if st.form_submit_button("解鎖系統", width="stretch"):
+                is_admin = ADMIN_PASSWORD is not None and pw == ADMIN_PASSWORD
+                if pw == PASSWORD or is_admin:
+                    st.session_state.logged_in = True
+                    st.session_state.is_admin = is_admin
+                    st.rerun()
                 else: st.error("密碼錯誤")
         return
 
+    if st.session_state.get('is_admin'):
+        render_admin_panel()
+
     # -----------------------------------------------------------------
     # 【第一階段】常駐戰情管理台 + 搜尋列表
     # -----------------------------------------------------------------
@@ -187,55 +1597,40 @@ def main():
         # 📊 戰情管理台面板
         if st.session_state.selected_uids:
             st.markdown("### 📊 戰情管理台 (已挑選項目)")
-            for idx, uid in enumerate(st.session_state.selected_uids):
-                matched_rows = df[df['uid'] == uid]
-                if matched_rows.empty: continue
-                case_info = matched_rows.iloc[0]
+            for idx, uid in enumerate(list(st.session_state.selected_uids)):
+                case_info = catalogue.by_uid.get(uid)
+                if case_info is None: continue
                 
                 col_name, col_audio, col_del = st.columns([5, 4, 1])
                 with col_name:
                     st.caption(f"**項目 {idx+1}**")
                     st.markdown(f"📄 {case_info['short']}")
                 with col_audio:
-                    # 影音雙軌精準切分比對
-                    link_clean_check = str(case_info['link']).split('?')[0].lower()
-                    title_clean_check = str(case_info['title']).replace(" ", "").lower()
-                    type_clean_check = str(case_info['type']).replace(" ", "").lower()
-                    
-                    is_explicit_audio = any(ext in link_clean_check for ext in ['.mp3', '.m4a', '.wav'])
-                    is_explicit_video = any(ext in link_clean_check for ext in ['.mp4', '.mov', '.avi'])
-                    
-                    if is_explicit_audio:
-                        is_panel_video = False
-                    elif is_explicit_video:
-                        is_panel_video = True
-                    else:
-                        is_panel_video = (
-                            any(k in title_clean_check for k in ['新鮮視', '側帶']) or 
-                            any(k in type_clean_check for k in ['新鮮視', '側帶'])
-                        )
-                    
-                    if not is_panel_video:
-                        if st.button("▶️ 載入音訊", key=f"panel_play_{uid}", use_container_width=True):
+                    # 影音雙軌分流已於載入時算好 (pack_video)
+                    if not case_info['pack_video']:
+                        if st.button("▶️ 載入音訊", key=f"panel_play_{uid}", width="stretch"):
                             with st.spinner("載入中..."):
-                                b64 = get_audio_base64(case_info['link'])
-                                if b64: st.audio(b64)
+                                audio_path = get_audio_path(case_info['link'])
+                                if audio_path: st.audio(audio_path, format="audio/mpeg")
                     else:
-                        st.link_button("📺 線上觀看影片", case_info['link'], use_container_width=True)
+                        st.link_button("📺 線上觀看影片", case_info['link'], width="stretch")
                         
                 with col_del:
                     st.markdown("剔除")
-                    if st.button("❌", key=f"panel_del_{uid}", use_container_width=True):
-                        st.session_state.selected_uids.remove(uid)
+                    if st.button("❌", key=f"panel_del_{uid}", width="stretch"):
+                        deselect_uid(uid)
                         st.rerun()
             st.markdown("---")
 
         # 💡 正名按鈕唯一常駐列
+        pack_limit = BATCH_MAX_ITEMS if st.session_state.batch_mode else PACK_GRID_SIZE
         c_status, c_ok = st.columns([3, 2])
         with c_status:
-            st.markdown(f"📥 已挑選進度： **{len(st.session_state.selected_uids)} / 6**")
+            st.markdown(f"📥 已挑選進度： **{len(st.session_state.selected_uids)} / {pack_limit}**")
+            # 已挑超過 6 個時鎖住開關，避免關掉批次模式後清單超量
+            st.session_state.batch_mode = st.toggle("📚 批次模式 (不限 6 個，自動分頁成多張六宮格)", value=st.session_state.batch_mode, key="batch_mode_toggle", disabled=len(st.session_state.selected_uids) > PACK_GRID_SIZE)
         with c_ok:
-            if st.button("👌 確認挑選項目", use_container_width=True, key="confirm_selection_main_btn", type="primary" if st.session_state.selected_uids else "secondary"):
+            if st.button("👌 確認挑選項目", width="stretch", key="confirm_selection_main_btn", type="primary" if st.session_state.selected_uids else "secondary"):
                 if st.session_state.selected_uids:
                     st.session_state.confirmed_stage = True
                     st.rerun()
@@ -243,80 +1638,87 @@ def main():
 
         st.markdown("---")
         
-        search_query = st.text_input("🔍 關鍵字搜尋 (比對標題內容)")
-        if 'last_search' not in st.session_state or st.session_state.last_search != search_query:
-            st.session_state.display_count = 20
-            st.session_state.last_search = search_query
+        search_query = st.text_input("🔍 關鍵字搜尋 (比對標題內容，可用空白分隔多個關鍵字)")
 
+        facets = catalogue.facets
         c1, c2 = st.columns(2)
         with c1:
-            cat_list = sorted([str(x) for x in df['category'].unique() if str(x).strip()])
-            sel_cat = st.selectbox("📂 總資料庫分類過濾", ["全部"] + cat_list)
+            sel_cat = st.selectbox("📂 總資料庫分類過濾", ["全部"] + facets.categories, format_func=lambda c: f"{c} ({facets.category_counts[c]})")
         with c2:
-            type_filter = st.radio("📑 類型過濾", ["全部", "企頻", "新鮮視", "側帶", "demo"], horizontal=True)
+            type_filter = st.radio("📑 類型過濾", ["全部"] + TYPE_FILTERS, format_func=lambda t: f"{t} ({facets.type_counts[t]})", horizontal=True)
 
-        mask = pd.Series([True] * len(df), index=df.index)
-        if search_query:
-            mask &= (df['title'].str.contains(search_query, case=False) | df['category'].str.contains(search_query, case=False))
-        if sel_cat != "全部":
-            mask &= (df['category'] == sel_cat)
-        if type_filter != "全部":
-            mask &= (df['type'].str.contains(type_filter, case=False) | df['title'].str.contains(type_filter, case=False))
+        # 搜尋或過濾條件一變就回到第一頁
+        if st.session_state.get('last_filters') != (search_query, sel_cat, type_filter):
+            st.session_state.result_page = 0
+            st.session_state.last_filters = (search_query, sel_cat, type_filter)
 
-        results = df[mask]
+        results = filter_catalogue(catalogue, search_query, sel_cat, type_filter)
         total_results = len(results)
+        total_pages = max(1, -(-total_results // RESULTS_PAGE_SIZE))
+        page = min(st.session_state.result_page, total_pages - 1)
         
         st.markdown("#### 📂 搜尋結果案例列表 (請在下方挑選打勾)")
-        current_results = results.head(st.session_state.display_count)
+        current_results = results.iloc[page * RESULTS_PAGE_SIZE:(page + 1) * RESULTS_PAGE_SIZE]
+        prune_row_widget_keys(set(current_results['uid']) | st.session_state.selected_uids.keys())
         
-        for _, row in current_results.iterrows():
-            uid = row['uid']
-            display_name = row['short']
-            t_low, tp_low = str(row['title']).lower(), str(row['type']).lower()
-            
-            is_audio = any(ext in t_low for ext in ['.mp3', '.wav', '.m4a']) or "企頻" in tp_low
-            is_video = any(x in tp_low for x in ["新鮮視", "側帶", "demo"]) or any(ext in t_low for ext in ['.mp4', '.mov'])
-            is_image = any(ext in t_low for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp'])
+        render_start = time.perf_counter()
+        for row in current_results[['uid', 'short', 'link', 'media_kind', 'share_block']].itertuples(index=False):
+            uid = row.uid
+            display_name = row.short
+            media_kind = row.media_kind
 
             col_check, col_exp = st.columns([1, 9])
             with col_check:
                 is_checked_before = uid in st.session_state.selected_uids
                 check_clicked = st.checkbox("選取", key=f"chk_{uid}", value=is_checked_before, label_visibility="collapsed")
                 if check_clicked and uid not in st.session_state.selected_uids:
-                    if len(st.session_state.selected_uids) < 6:
-                        st.session_state.selected_uids.append(uid)
+                    if len(st.session_state.selected_uids) < pack_limit:
+                        st.session_state.selected_uids[uid] = None
+                        record_selection(uid)
                         st.rerun()
-                    else: st.error("❌ 最多只能打包 6 個案例！")
+                    else: st.error(f"❌ 最多只能打包 {pack_limit} 個案例！")
                 elif not check_clicked and uid in st.session_state.selected_uids:
-                    st.session_state.selected_uids.remove(uid)
+                    st.session_state.selected_uids.pop(uid, None)
                     st.rerun()
 
             with col_exp:
-                with st.expander(f"📄 {display_name}"):
-                    if is_audio:
+                # 追蹤展開狀態：Drive 預覽 iframe 只在使用者打開時才載入
+                exp = st.expander(f"📄 {display_name}", key=f"exp_{uid}", on_change="rerun")
+                with exp:
+                    if media_kind == 'audio':
                         if st.button("▶️ 載入音訊", key=f"p_{uid}"):
-                            b64 = get_audio_base64(row['link'])
-                            if b64: st.audio(b64)
-                    elif is_video: st.info("📺 影片預覽：限同仁點擊下方『開啟檔案』觀看。")
-                    elif is_image: st.warning("🖼️ 此為『圖片檔』。同仁請點擊下方『開啟檔案』查看。")
-                    else: components.iframe(get_embed_url(row['link']), height=400)
+                            audio_path = get_audio_path(row.link)
+                            if audio_path: st.audio(audio_path, format="audio/mpeg")
+                    elif media_kind == 'video': st.info("📺 影片預覽：限同仁點擊下方『開啟檔案』觀看。")
+                    elif media_kind == 'image': st.warning("🖼️ 此為『圖片檔』。同仁請點擊下方『開啟檔案』查看。")
+                    elif exp.open: components.iframe(get_embed_url(row.link), height=400)
                     
                     bt1, bt2 = st.columns(2)
-                    with bt1: st.link_button("↗ 開氣檔案", row['link'], use_container_width=True)
+                    with bt1: st.link_button("↗ 開氣檔案", row.link, width="stretch")
                     with bt2:
                         # 💡 完美修正：將原本綁錯的變數修復，重新召喚「🔗 分享檔案」網址複製功能！
-                        if st.button("🔗 分享檔案", key=f"s_{uid}", use_container_width=True):
-                            show_share_dialog(display_name, row['link'], uid, is_video=is_video, is_image=is_image)
+                        if st.button("🔗 分享檔案", key=f"s_{uid}", width="stretch"):
+                            show_share_dialog(display_name, row.link, uid, is_video=row.share_block == 'video', is_image=row.share_block == 'image')
+        record_timing("results_render", time.perf_counter() - render_start)
 
-        if total_results > st.session_state.display_count:
-            if st.button(f"🔽 展開更多案例", use_container_width=True):
-                st.session_state.display_count += 20
-                st.rerun()
+        if total_pages > 1:
+            c_prev, c_page, c_next = st.columns([1, 2, 1])
+            with c_prev:
+                if st.button("◀ 上一頁", width="stretch", disabled=page == 0, key="result_prev_page_btn"):
+                    st.session_state.result_page = page - 1
+                    st.rerun()
+            with c_page:
+                st.markdown(f"<p style='text-align:center;margin-top:8px;'>第 {page + 1} / {total_pages} 頁 (共 {total_results} 筆)</p>", unsafe_allow_html=True)
+            with c_next:
+                if st.button("下一頁 ▶", width="stretch", disabled=page >= total_pages - 1, key="result_next_page_btn"):
+                    st.session_state.result_page = page + 1
+                    st.rerun()
 
     # -----------------------------------------------------------------
     # 【第二階段】配置與最終 PPTX 封裝生成頁面
     # -----------------------------------------------------------------
     if st.session_state.confirmed_stage and st.session_state.selected_uids:
+        prune_row_widget_keys(st.session_state.selected_uids.keys())
         st.markdown("""
         <div style="background-color:#e0f2fe; padding:20px; border-radius:10px; border-left:5px solid #0284c7; margin: 15px 0;">
             <h4 style="color:#0369a1; margin:0;">🎯 第二階段：確認各案例 Logo 與自訂簡報大標</h4>
@@ -326,25 +1728,20 @@ def main():
         
         st.markdown("### 🖋️ 編輯 PPT 簡報大標題")
         custom_ppt_title = st.text_input("請輸入您想要的 PPT 簡報主標題：", value="合作夥伴案例分享", key="custom_ppt_title_input")
+        group_by_category = False
+        if len(st.session_state.selected_uids) > PACK_GRID_SIZE:
+            group_by_category = st.checkbox("🗂️ 依總資料庫分類分組，每組前加一張章節頁", key="group_by_category_chk")
         st.markdown("---")
         
-        logo_options = ["請選擇確切客戶 Logo"] + sorted(list(logo_df['client_name'].unique())) if not logo_df.empty else ["請選擇確切客戶 Logo"]
+        logo_options = logo_table.options
         final_pack_pairs = {}
 
-        for idx, picked_uid in enumerate(st.session_state.selected_uids):
-            matched_rows = df[df['uid'] == picked_uid]
-            if matched_rows.empty: continue
-            case_row = matched_rows.iloc[0]
+        for idx, picked_uid in enumerate(list(st.session_state.selected_uids)):
+            case_row = catalogue.by_uid.get(picked_uid)
+            if case_row is None: continue
             case_title = str(case_row['short'])
-            case_type_str = str(case_row['type'])
             
-            guessed_logo_for_this_row = "請選擇確切客戶 Logo"
-            if not logo_df.empty:
-                for client in logo_df['client_name'].unique():
-                    pure_name = str(client).split('_')[-1] if '_' in str(client) else str(client)
-                    if pure_name in case_title or str(client) in case_title:
-                        guessed_logo_for_this_row = client
-                        break
+            guessed_logo_for_this_row = match_logo(logo_table.matcher, case_title) or LOGO_PLACEHOLDER
             
             c_label, c_case_lbl, c_logo_sel, c_del = st.columns([1, 4, 3, 1])
             with c_label: st.markdown(f"\n\n**案例 {idx+1}**")
@@ -353,26 +1750,22 @@ def main():
                 st.info(f"📄 {case_title}")
             with c_logo_sel:
                 st.markdown("對應 Logo")
-                default_idx = logo_options.index(guessed_logo_for_this_row) if guessed_logo_for_this_row in logo_options else 0
+                default_idx = logo_table.option_index.get(guessed_logo_for_this_row, 0)
                 chosen_logo_for_row = st.selectbox(f"選Logo_{picked_uid}", options=logo_options, index=default_idx, key=f"sel_logo_pair_{picked_uid}", label_visibility="collapsed")
-                
-                logo_row = logo_df[logo_df['client_name'] == chosen_logo_for_row]
-                raw_url = logo_row.iloc[0]['logo_link'] if not logo_row.empty else ""
-                file_id = ""
-                if "/file/d/" in raw_url: file_id = raw_url.split("/file/d/")[1].split("/")[0]
-                elif "id=" in raw_url: file_id = raw_url.split("id=")[1].split("&")[0]
+                file_id = logo_table.file_ids.get(chosen_logo_for_row, "")
                 
                 final_pack_pairs[picked_uid] = {
                     'case_title': case_title,
-                    'case_type': case_type_str,
-                    'case_link': case_row['link'], 
+                    'case_link': case_row['link'],
+                    'is_mp4': case_row['pack_video'],
                     'logo_name': chosen_logo_for_row,
-                    'logo_file_id': file_id
+                    'logo_file_id': file_id,
+                    'category': str(case_row['category']).strip()
                 }
             with c_del:
                 st.markdown("剔除")
-                if st.button("❌", key=f"del_item_{picked_uid}", use_container_width=True):
-                    st.session_state.selected_uids.remove(picked_uid)
+                if st.button("❌", key=f"del_item_{picked_uid}", width="stretch"):
+                    deselect_uid(picked_uid)
                     st.rerun()
 
             st.markdown("<div style='margin-bottom:-10px;'></div>", unsafe_allow_html=True) 
@@ -381,145 +1774,25 @@ def main():
         
         c_back, c_action = st.columns([1, 4])
         with c_back:
-            if st.button("🔙 返回挑選更多案例", use_container_width=True, key="unique_back_btn"):
+            if st.button("🔙 返回挑選更多案例", width="stretch", key="unique_back_btn"):
                 st.session_state.confirmed_stage = False
                 st.rerun()
                 
         with c_action:
             if final_pack_pairs:
-                from pptx import Presentation
-                from pptx.util import Inches, Pt
-                from pptx.enum.text import PP_ALIGN 
-                
-                ppt_buffer = io.BytesIO()
-                
-                if st.button("🎨 確認無誤！開始排版並下載六宮格提案 PPTX", use_container_width=True, key="generate_final_pptx_execution_btn", type="primary"):
-                    with st.spinner("🚀 正在下載多媒體素材並極速封裝簡報中..."):
-                        try:
-                            prs = Presentation()
-                            prs.slide_width = Inches(13.333)
-                            prs.slide_height = Inches(7.5)
-                            slide = prs.slides.add_slide(prs.slide_layouts[6])
-                            
-                            # 大標題設定
-                            title_box = slide.shapes.add_textbox(Inches(0.6), Inches(0.4), Inches(12.133), Inches(1.0))
-                            tf = title_box.text_frame
-                            tf.word_wrap = True
-                            p_title = tf.paragraphs[0]
-                            p_title.text = str(custom_ppt_title).strip()
-                            p_title.font.size = Pt(36) 
-                            p_title.font.bold = True
-                            p_title.font.name = "Microsoft JhengHei"
-                            p_title.alignment = PP_ALIGN.CENTER 
-                            
-                            x_coords = [Inches(0.6), Inches(4.8), Inches(9.0)]
-                            y_coords = [Inches(2.0), Inches(4.7)]
-                            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}
-                            
-                            # 預先下載音訊用去背小喇叭
-                            resp_icon = requests.get(DEFAULT_SPEAKER_ICON_URL, headers=headers, timeout=5)
-                            icon_bytes = resp_icon.content if resp_icon.status_code == 200 else None
-                            
-                            for idx, (uid, info) in enumerate(final_pack_pairs.items()):
-                                if idx >= 6: break 
-                                row_idx, col_idx = idx // 3, idx % 3   
-                                current_x, current_y = x_coords[col_idx], y_coords[row_idx]
-                                
-                                text_box = slide.shapes.add_textbox(current_x, current_y, Inches(3.8), Inches(0.5))
-                                text_box.text_frame.word_wrap = True
-                                p_case = text_box.text_frame.paragraphs[0]
-                                p_case.text = f"🔹 {info['case_title']}"
-                                p_case.font.size = Pt(11)
-                                p_case.font.name = "Microsoft JhengHei"
-                                
-                                # 副檔名與欄位雙重分流
-                                title_clean = info['case_title'].replace(" ", "").lower()
-                                type_clean = info['case_type'].replace(" ", "").lower()
-                                link_clean = info['case_link'].split('?')[0].lower()
-                                
-                                is_explicit_audio = any(ext in link_clean for ext in ['.mp3', '.m4a', '.wav'])
-                                is_explicit_video = any(ext in link_clean for ext in ['.mp4', '.mov', '.avi'])
-                                
-                                if is_explicit_audio:
-                                    is_mp4 = False
-                                elif is_explicit_video:
-                                    is_mp4 = True
-                                else:
-                                    is_mp4 = (
-                                        any(k in title_clean for k in ['新鮮視', '側帶']) or 
-                                        any(k in type_clean for k in ['新鮮視', '側帶'])
-                                    )
-                                
-                                if info['case_link']:
-                                    try:
-                                        media_url = info['case_link'].split('?')[0] + "?download=1" if "sharepoint.com" in info['case_link'] else info['case_link']
-                                        resp_media = requests.get(media_url, headers=headers, timeout=20)
-                                        
-                                        if resp_media.status_code == 200:
-                                            suffix_str = '.mp4' if is_mp4 else '.mp3'
-                                            mime_str = 'video/mp4' if is_mp4 else 'audio/mpeg'
-                                            
-                                            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix_str) as tmp_media:
-                                                tmp_media.write(resp_media.content)
-                                                tmp_media_path = tmp_media.name
-                                            
-                                            if is_mp4:
-                                                slide.shapes.add_movie(
-                                                    tmp_media_path,
-                                                    current_x + Inches(0.2),
-                                                    current_y + Inches(0.65),
-                                                    width=Inches(1.4),
-                                                    height=Inches(1.0),
-                                                    poster_frame_image=None,  
-                                                    mime_type=mime_str
-                                                )
-                                            else:
-                                                poster_stream = io.BytesIO(icon_bytes) if icon_bytes else None
-                                                slide.shapes.add_movie(
-                                                    tmp_media_path,
-                                                    current_x + Inches(0.2),
-                                                    current_y + Inches(0.7),
-                                                    width=Inches(0.5), 
-                                                    height=Inches(0.5),
-                                                    poster_frame_image=poster_stream, 
-                                                    mime_type=mime_str
-                                                )
-                                            try: os.unlink(tmp_media_path)
-                                            except: pass
-                                    except: pass
-                                
-                                # 嵌入去背品牌 Logo
-                                if info.get('logo_file_id') and info['logo_name'] != "請選擇確切客戶 Logo":
-                                    try:
-                                        direct_img_url = f"https://lh3.googleusercontent.com/u/0/d/{info['logo_file_id']}"
-                                        resp_logo = requests.get(direct_img_url, headers=headers, timeout=10)
-                                        if resp_logo.status_code == 200 and len(resp_logo.content) > 1000:
-                                            x_offset = Inches(1.8) if is_mp4 else Inches(1.0)
-                                            slide.shapes.add_picture(
-                                                io.BytesIO(resp_logo.content), 
-                                                current_x + x_offset, 
-                                                current_y + Inches(0.65), 
-                                                width=Inches(1.6)
-                                            )
-                                    except: pass
-                                        
-                            prs.save(ppt_buffer)
-                            ppt_buffer.seek(0)
-                            today_str = datetime.now().strftime("%Y%m%d")
-                            
-                            st.download_button(
-                                label="💾 簡報封裝完畢！點此儲存 PPTX 檔案至電腦",
-                                data=ppt_buffer,
-                                file_name=f"媒體通路提案簡報_{today_str}.pptx",
-                                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                                use_container_width=True,
-                                key="final_download_pptx_stream_btn",
-                                type="primary"
-                            )
-                        except Exception as e:
-                            st.error(f"❌ 簡報自動生成失敗，原因：{str(e)}")
+                export_job = get_export_job(st.session_state.export_job_id) if st.session_state.export_job_id else None
+                export_busy = export_job is not None and export_job['status'] in ('queued', 'running')
+                if st.button("🎨 確認無誤！開始排版並下載六宮格提案 PPTX", width="stretch", key="generate_final_pptx_execution_btn", type="primary", disabled=export_busy):
+                    st.session_state.export_job_id = submit_export_job(custom_ppt_title, final_pack_pairs, group_by_category)
+                    st.rerun()
+                if export_busy: render_export_progress(export_job['id'])
+                elif export_job is not None: render_export_result(export_job)
             else: st.warning("⚠️ 您的挑選清單目前為空。")
         st.markdown("---")
 
+# 💡 streamlit run 偵測到 st.App 會以 ASGI 模式啟動，多掛上簡報下載路由；頁面本身照常執行 main()
+app = st.App(__file__, routes=[Route("/exports/{token}", export_download)])
+
 if __name__ == "__main__":
-    main()
+    with timed_section("rerun"):
+        main()
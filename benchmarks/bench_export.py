@@ -0,0 +1,65 @@
+"""六宮格簡報匯出的冷/熱啟動計時 (離線執行，素材全在本機產生)
+
+用法: python benchmarks/bench_export.py [重複次數]
+"""
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+
+def make_assets(work_dir):
+    """產生 3 支音檔、3 支影片、1 張 Logo 與小喇叭圖示，回傳 build_pack_deck 需要的參數"""
+    from PIL import Image
+
+    logo_path = os.path.join(work_dir, "logo.png")
+    Image.new("RGBA", (320, 160), (200, 30, 30, 255)).save(logo_path)
+    icon = io.BytesIO()
+    Image.new("RGBA", (96, 96), (30, 30, 200, 255)).save(icon, format="PNG")
+
+    pairs, assets = {}, {}
+    for i in range(6):
+        is_mp4 = i % 2 == 1
+        media_path = os.path.join(work_dir, f"case{i}{'.mp4' if is_mp4 else '.mp3'}")
+        with open(media_path, "wb") as f:
+            f.write(os.urandom(512 * 1024))
+        uid = f"case{i}"
+        pairs[uid] = {'case_title': f"測試案例 {i}", 'is_mp4': is_mp4}
+        assets[uid] = {'is_mp4': is_mp4, 'media_path': media_path, 'poster_path': None, 'logo_path': logo_path, 'work_dir': work_dir}
+    return pairs, assets, icon.getvalue()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    start = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - start) * 1000
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        pairs, assets, icon_bytes = make_assets(work_dir)
+        out_path = os.path.join(work_dir, "deck.pptx")
+        cold_ms = timed(app.build_pack_deck, "冷啟動", pairs, assets, icon_bytes, out_path)
+        warm = [timed(app.build_pack_deck, "熱啟動", pairs, assets, icon_bytes, out_path) for _ in range(REPEAT)]
+        skeleton = [timed(app.new_pack_deck) for _ in range(REPEAT)]
+
+    print(f"import app (含 pptx)        {import_ms:8.1f} ms")
+    print(f"冷啟動匯出 (首次建骨架)     {cold_ms:8.1f} ms")
+    print(f"熱啟動匯出 中位數 x{REPEAT:<4}    {statistics.median(warm):8.1f} ms")
+    print(f"熱啟動匯出 最慢             {max(warm):8.1f} ms")
+    print(f"複製骨架 中位數             {statistics.median(skeleton):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
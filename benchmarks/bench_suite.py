@@ -0,0 +1,224 @@
+"""離線基準測試：本機假伺服器提供合成試算表 (預設 1k / 10k / 100k 列中文標題)、假影音與 Logo，
+量測 load_data、load_logo_data、搜尋過濾、第二階段 Logo 比對、試聽音檔與完整 PPTX 匯出的延遲、吞吐量與記憶體高峰。
+全程不連外網，每次結果可以直接前後比較。
+
+用法: python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--repeat 5] [--latency-ms 0] [--json 結果.json]
+"""
+import argparse
+import functools
+import http.server
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BRANDS = ["可口可樂", "全家", "統一", "義美", "光泉", "味全", "金車", "桂格", "舒跑", "御茶園",
+          "黑松", "維他露", "泰山", "愛之味", "立頓", "雀巢", "麥香", "原萃", "伯朗", "茶裏王",
+          "樂事", "品客", "多力多滋", "乖乖", "科學麵", "華航", "長榮", "中華電信", "台灣大哥大", "遠傳"]
+REGIONS = ["台北", "新北", "桃園", "台中", "台南", "高雄", "新竹", "宜蘭", "花蓮", "台東"]
+TOPICS = ["夏日廣告", "新品上市", "會員活動", "中秋檔期", "跨年促銷", "開學季", "門市廣播", "節慶快閃"]
+CATEGORIES = ["飲料", "零售", "食品", "金融", "電信", "航空"]
+TYPES = ["企頻", "新鮮視", "側帶", "demo"]
+SEARCH_CASES = [
+    ("可口", "全部", "全部"), ("全家 廣告", "全部", "全部"), ("新鮮視", "全部", "全部"),
+    ("夏日", "飲料", "全部"), ("高雄 會員活動", "全部", "企頻"), ("不存在的關鍵字", "全部", "全部"),
+    ("", "零售", "全部"), ("", "全部", "側帶"),
+]
+
+
+class FakeUpstream(http.server.SimpleHTTPRequestHandler):
+    """假的 Google Sheets / Drive / 圖示主機：靜態檔案 + Last-Modified，可模擬固定延遲"""
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.latency: time.sleep(self.latency)
+        return super().do_GET()
+
+
+def write_fixtures(data_dir, base_url, sizes, rng):
+    from PIL import Image
+
+    media_dir = os.path.join(data_dir, "media")
+    os.makedirs(media_dir)
+    for k in range(4):
+        with open(os.path.join(media_dir, f"a{k}.mp3"), "wb") as f: f.write(os.urandom(2 * 1024 * 1024))
+        with open(os.path.join(media_dir, f"v{k}.mp4"), "wb") as f: f.write(os.urandom(8 * 1024 * 1024))
+    Image.new("RGBA", (1200, 600), (200, 30, 30, 255)).save(os.path.join(data_dir, "logo.png"))
+    Image.new("RGBA", (96, 96), (30, 30, 200, 255)).save(os.path.join(data_dir, "speaker.png"))
+
+    for n in sizes:
+        with open(os.path.join(data_dir, f"catalogue_{n}.csv"), "w", encoding="utf-8") as f:
+            f.write("title,link,category,type,short\n")
+            for i in range(n):
+                brand, region, topic = rng.choice(BRANDS), rng.choice(REGIONS), rng.choice(TOPICS)
+                tp = rng.choice(TYPES)
+                if tp == "企頻":
+                    title, link = f"{brand}_{region}{topic}{i}.mp3", f"{base_url}/media/a{i % 4}.mp3?row={i}"
+                elif i % 7 == 0:
+                    title, link = f"{brand}{topic}海報{i}.png", f"{base_url}/media/p{i}.png"
+                else:
+                    title, link = f"{tp} {brand} {region}{topic}{i}", f"{base_url}/media/v{i % 4}.mp4?row={i}"
+                f.write(f"{title},{link},{rng.choice(CATEGORIES)},{tp},{brand}{region}{topic}{i}\n")
+        with open(os.path.join(data_dir, f"logo_{n}.csv"), "w", encoding="utf-8") as f:
+            f.write("分類,客戶名稱,Logo 連結\n")
+            for j in range(max(len(BRANDS), n // 20)):
+                name = BRANDS[j] if j < len(BRANDS) else f"{rng.choice(BRANDS)}{rng.choice(REGIONS)}{j}"
+                f.write(f"{rng.choice(CATEGORIES)},{rng.choice(CATEGORIES)}_{name},https://drive.google.com/file/d/L{j}/view\n")
+
+
+def start_server(data_dir, latency_ms):
+    handler = type("Handler", (FakeUpstream,), {'latency': latency_ms / 1000})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=data_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Recorder:
+    def __init__(self):
+        self.rows = []
+
+    def measure(self, name, fn, rows=None, repeat=1, items=1, reset=None, unit="次"):
+        """跑 repeat 次取延遲，再額外跑一次開 tracemalloc 量 Python 記憶體高峰；reset 在每次執行前把快取清回冷狀態"""
+        times = []
+        for _ in range(repeat):
+            if reset: reset()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        if reset: reset()
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        median = statistics.median(times)
+        row = {
+            'name': name, 'rows': rows, 'repeat': repeat,
+            'median_ms': round(median * 1000, 2), 'max_ms': round(max(times) * 1000, 2),
+            'throughput': round(items / median, 1) if median else None, 'unit': unit,
+            'peak_mb': round(peak / 1024 / 1024, 2),
+        }
+        self.rows.append(row)
+        print(f"{name:<24}{rows or '':>8}{row['median_ms']:>12.2f}{row['max_ms']:>12.2f}{row['throughput']:>14,.1f} {unit}/s{row['peak_mb']:>10.2f}", flush=True)
+        return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0, help="假伺服器每個請求額外延遲")
+    parser.add_argument("--json", help="另存 JSON 結果，方便前後比較")
+    args = parser.parse_args()
+    sizes = [int(x) for x in args.sizes.split(",")]
+
+    work_dir = tempfile.mkdtemp(prefix="swd_bench_")
+    data_dir = os.path.join(work_dir, "upstream")
+    os.makedirs(data_dir)
+    server = start_server(data_dir, args.latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    write_fixtures(data_dir, base_url, sizes, random.Random(20240601))
+
+    # 環境變數要在 import app 之前設好；快取目錄放在這次的暫存區，冷啟動才是真的冷
+    os.environ["SWD_MEDIA_CACHE_DIR"] = os.path.join(work_dir, "cache")
+    os.environ["SWD_SNAPSHOT_DIR"] = os.path.join(work_dir, "snapshots")
+    os.environ["SWD_SPEAKER_ICON_URL"] = f"{base_url}/speaker.png"
+    os.environ["SWD_LOGO_IMAGE_URL"] = f"{base_url}/logo.png?id={{file_id}}"
+    os.environ.setdefault("SWD_PACK_OPTIMIZE", "0")
+    import app
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)  # 離線執行沒有 ScriptRunContext，提示沒有意義
+
+    def drop_sheet(url, keep_snapshot=False):
+        # keep_snapshot=True 模擬行程重啟：記憶體清空，但本機 Parquet 快照還在
+        app._sheet_cache()['entries'].pop(url, None)
+        if not keep_snapshot:
+            shutil.rmtree(os.path.join(app.SNAPSHOT_DIR, app.generate_id(url)), ignore_errors=True)
+
+    def clear_media():
+        shutil.rmtree(app.MEDIA_CACHE_DIR, ignore_errors=True)
+        app._content_digests().clear()
+        app.static_asset_bytes.clear()
+
+    rec = Recorder()
+    print(f"{'項目':<22}{'列數':>6}{'中位數(ms)':>10}{'最慢(ms)':>10}{'吞吐量':>14}{'記憶體高峰(MB)':>16}")
+    catalogue = logo_table = None
+    for n in sizes:
+        app.CSV_URL = f"{base_url}/catalogue_{n}.csv"
+        app.CSV_LOGO_URL = f"{base_url}/logo_{n}.csv"
+        repeat = args.repeat if n <= 10000 else max(1, args.repeat // 2)
+
+        rec.measure("load_data 冷啟動", app.load_data, n, repeat, n, lambda: drop_sheet(app.CSV_URL), "列")
+        rec.measure("load_data 讀回本機快照", app.load_data, n, repeat, n, lambda: drop_sheet(app.CSV_URL, keep_snapshot=True), "列")
+        rec.measure("load_data 熱快照", app.load_data, n, repeat * 20, 1)
+        rec.measure("試算表回源驗證", lambda: app.refresh_sheet(app.CSV_URL, app.build_catalogue), n, repeat, 1)
+        rec.measure("load_logo_data 冷啟動", app.load_logo_data, n, repeat, max(len(BRANDS), n // 20), lambda: drop_sheet(app.CSV_LOGO_URL), "客戶")
+        catalogue, logo_table = app.load_data(), app.load_logo_data()
+
+        def run_searches():
+            for query, cat, tp in SEARCH_CASES:
+                app.filter_catalogue(catalogue, query, cat, tp)
+        rec.measure("搜尋過濾", run_searches, n, repeat, len(SEARCH_CASES), unit="查詢")
+
+        shorts = catalogue.df['short'].astype(str).tolist()
+        def run_logo_match():
+            for title in shorts:
+                app.match_logo(logo_table.matcher, title)
+        rec.measure("第二階段 Logo 比對", run_logo_match, n, repeat, len(shorts), unit="標題")
+
+    # 以下與試算表大小無關，用最後一份目錄跑一次
+    df = catalogue.df
+    audio_links = df.loc[df['media_kind'] == 'audio', 'link'].head(20).tolist()
+    def run_audio():
+        for link in audio_links:
+            app.get_audio_path(link)
+    rec.measure("試聽音檔 冷快取", run_audio, None, max(1, args.repeat // 2), len(audio_links), clear_media, "檔")
+    rec.measure("試聽音檔 熱快取", run_audio, None, args.repeat, len(audio_links), unit="檔")
+
+    def pack_pairs(count):
+        pairs = {}
+        for row in df[df['media_kind'].isin(['audio', 'video'])].head(count).itertuples(index=False):
+            logo_name = app.match_logo(logo_table.matcher, str(row.short)) or app.LOGO_PLACEHOLDER
+            pairs[row.uid] = {'case_title': str(row.short), 'case_link': row.link, 'is_mp4': row.pack_video,
+                              'logo_name': logo_name, 'logo_file_id': logo_table.file_ids.get(logo_name, ""), 'category': str(row.category)}
+        return pairs
+
+    def export(pairs):
+        assets = {}
+        try:
+            assets, icon_bytes, _ = app.fetch_pack_assets(pairs)
+            with tempfile.TemporaryFile() as out:
+                app.build_pack_deck("基準測試", pairs, assets, icon_bytes, out, group_by_category=len(pairs) > app.PACK_GRID_SIZE)
+        finally:
+            app.cleanup_pack_assets(assets)
+
+    six, sixty = pack_pairs(app.PACK_GRID_SIZE), pack_pairs(app.BATCH_MAX_ITEMS)
+    rec.measure("PPTX 匯出 6 案 冷快取", lambda: export(six), None, max(1, args.repeat // 2), len(six), clear_media, "案")
+    rec.measure("PPTX 匯出 6 案 熱快取", lambda: export(six), None, args.repeat, len(six), unit="案")
+    export(sixty)  # 先把 60 案素材抓進快取
+    rec.measure("PPTX 匯出 60 案 熱快取", lambda: export(sixty), None, max(1, args.repeat // 2), len(sixty), unit="案")
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n整個行程 RSS 高峰 {max_rss_mb:.0f} MB (tracemalloc 只計 Python 配置，pyarrow 緩衝區不在內)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'sizes': sizes, 'latency_ms': args.latency_ms, 'max_rss_mb': round(max_rss_mb, 1), 'results': rec.rows}, f, ensure_ascii=False, indent=2)
+
+    server.shutdown()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import logging
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 測試直接呼叫 app 函數，沒有 ScriptRunContext，Streamlit 的提示沒有意義
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
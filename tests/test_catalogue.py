@@ -0,0 +1,124 @@
+"""試算表增量重建必須與完整重建結果相同，同步失敗不可記下新的 ETag"""
+import contextlib
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+CATEGORIES = ["飲料", "零售", "設計", "案例資料庫說明"]
+TYPES = ["企頻", "新鮮視", "側帶", "demo", "海報"]
+EXTS = [".mp3", ".mp4", ".png", ".wav", ""]
+
+
+def make_rows(rng, n, start=0):
+    rows = []
+    for i in range(start, start + n):
+        ext = rng.choice(EXTS)
+        rows.append({
+            'title': f"{rng.choice(['全家', '可口可樂', 'Abc'])}{rng.choice(TYPES)}{i}{ext}",
+            'link': f"https://example.sharepoint.com/media/{i}{ext}" if i % 29 else "https://drive.google.com/drive/folders/x",
+            'category': rng.choice(CATEGORIES),
+            'type': rng.choice(TYPES),
+            'short': "" if i % 3 else f"短名{i}",
+        })
+    return rows
+
+
+def to_csv(rows):
+    return pd.DataFrame(rows)[['title', 'link', 'category', 'type', 'short']].to_csv(index=False).encode()
+
+
+def assert_catalogue_equal(a, b):
+    pd.testing.assert_frame_equal(a.df, b.df)
+    assert a.by_uid == b.by_uid
+    assert a.share_map == b.share_map
+    for field in app.SEARCH_FIELD_WEIGHTS:
+        assert list(a.search_index.texts[field]) == list(b.search_index.texts[field])
+        pa_, pb = a.search_index.postings[field], b.search_index.postings[field]
+        assert pa_.keys() == pb.keys()
+        assert all(np.array_equal(pa_[g], pb[g]) for g in pa_)
+    assert a.facets.categories == b.facets.categories
+    assert a.facets.category_counts == b.facets.category_counts
+    assert a.facets.type_counts == b.facets.type_counts
+    for name in a.facets.category_masks:
+        assert np.array_equal(a.facets.category_masks[name], b.facets.category_masks[name])
+    for name in a.facets.type_masks:
+        assert np.array_equal(a.facets.type_masks[name], b.facets.type_masks[name])
+
+
+def test_incremental_build_equals_full_rebuild():
+    rng = random.Random(3)
+    v1 = make_rows(rng, 300)
+    v2 = [dict(r) for r in v1]
+    for r in rng.sample(v2, 40):  # 修改
+        r['title'] += "（改）"
+    for r in rng.sample(v2, 20):  # 刪除
+        v2.remove(r)
+    v2 += make_rows(rng, 30, start=1000)  # 新增
+    v2 += rng.sample(v2, 5)  # 重複列
+    rng.shuffle(v2)  # 重新排序
+
+    _, derived_v1 = app.build_catalogue(to_csv(v1), None)
+    incremental, derived_inc = app.build_catalogue(to_csv(v2), derived_v1)
+    full, derived_full = app.build_catalogue(to_csv(v2), None)
+    assert_catalogue_equal(incremental, full)
+    pd.testing.assert_frame_equal(derived_inc, derived_full)
+
+
+def test_incremental_build_from_identical_sheet():
+    raw = to_csv(make_rows(random.Random(5), 120))
+    first, derived = app.build_catalogue(raw, None)
+    again, derived_again = app.build_catalogue(raw, derived)
+    assert_catalogue_equal(first, again)
+    pd.testing.assert_frame_equal(derived, derived_again)
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code, self.content, self.headers = status_code, content, headers or {}
+
+
+@pytest.fixture
+def upstream(monkeypatch, tmp_path):
+    """以記憶體模擬會回 304 的發布網址"""
+    state = {'content': b"", 'etag': None, 'requests': []}
+
+    @contextlib.contextmanager
+    def fake_http_get(url, timeout, headers=None, **kwargs):
+        state['requests'].append(dict(headers or {}))
+        if headers and headers.get('If-None-Match') == state['etag']:
+            yield FakeResponse(304)
+        else:
+            yield FakeResponse(200, state['content'], {'ETag': state['etag']})
+
+    monkeypatch.setattr(app, "http_get", fake_http_get)
+    monkeypatch.setattr(app, "SNAPSHOT_DIR", str(tmp_path))
+    return state
+
+
+def test_failed_build_does_not_store_validators(upstream):
+    url = f"https://sheets.invalid/{random.random()}"
+    rng = random.Random(9)
+    upstream.update(content=to_csv(make_rows(rng, 50)), etag='"v1"')
+    entry = app.refresh_sheet(url, app.build_catalogue)
+    assert entry['last_error'] is None and entry['etag'] == '"v1"'
+    first = entry['snapshot']
+
+    # 新版內容解析失敗 (例如發布成空白)：快照與 ETag 都維持舊版
+    upstream.update(content=b"", etag='"v2"')
+    entry = app.refresh_sheet(url, app.build_catalogue)
+    assert entry['last_error'] and entry['snapshot'] is first and entry['etag'] == '"v1"'
+
+    # 同一個 ETag 的內容修好後，下一輪必須完整下載而不是拿到 304
+    upstream['content'] = to_csv(make_rows(rng, 60))
+    entry = app.refresh_sheet(url, app.build_catalogue)
+    assert upstream['requests'][-1].get('If-None-Match') == '"v1"'
+    assert entry['last_error'] is None and entry['etag'] == '"v2"' and len(entry['snapshot'].df) != len(first.df)
+
+    # 之後沒有變動就走 304，快照不重建
+    second = entry['snapshot']
+    entry = app.refresh_sheet(url, app.build_catalogue)
+    assert upstream['requests'][-1].get('If-None-Match') == '"v2"' and entry['snapshot'] is second
@@ -0,0 +1,133 @@
+"""佔位影音換檔後的 PPTX 必須能被 python-pptx 開啟，且內嵌影音與快取檔逐位元組相同；
+頁面 (__main__) 產生的簡報必須能從 app 模組的 /exports 路由下載"""
+import asyncio
+import importlib.util
+import io
+import os
+import time
+import zipfile
+
+import pytest
+import streamlit as st
+from PIL import Image
+from pptx import Presentation
+from starlette.requests import Request
+
+import app
+
+
+@pytest.fixture
+def pack(tmp_path):
+    logo_path = tmp_path / "logo.png"
+    Image.new("RGBA", (320, 160), (200, 30, 30, 255)).save(logo_path)
+    poster_path = tmp_path / "poster.png"
+    Image.new("RGB", (160, 90), (10, 120, 10)).save(poster_path)
+    icon = io.BytesIO()
+    Image.new("RGBA", (96, 96), (30, 30, 200, 255)).save(icon, format="PNG")
+
+    pairs, assets = {}, {}
+    for i in range(8):  # 超過六宮格，順便涵蓋分頁
+        is_mp4 = i % 2 == 1
+        uid = f"case{i}"
+        media_path = tmp_path / f"{uid}{'.mp4' if is_mp4 else '.mp3'}"
+        media_path.write_bytes(os.urandom(64 * 1024 + i))
+        pairs[uid] = {'case_title': f"測試案例 {i}", 'is_mp4': is_mp4, 'category': "飲料" if i < 4 else "零售"}
+        assets[uid] = {'is_mp4': is_mp4, 'media_path': str(media_path), 'poster_path': str(poster_path) if is_mp4 else None,
+                       'logo_path': str(logo_path) if i % 3 else None, 'work_dir': str(tmp_path)}
+    # 一個案例影音下載失敗，不應產生影音物件
+    assets['case7']['media_path'] = None
+    return pairs, assets, icon.getvalue()
+
+
+def embedded_media(pptx_file):
+    """回傳各投影片上影音物件連結到的媒體內容"""
+    blobs = []
+    for slide in Presentation(pptx_file).slides:
+        for rel in slide.part.rels.values():
+            if rel.reltype.endswith("/media") and not rel.is_external:
+                blobs.append(rel.target_part.blob)
+    return blobs
+
+
+@pytest.mark.parametrize("group_by_category", [False, True])
+def test_swapped_deck_opens_with_identical_media(tmp_path, pack, group_by_category):
+    pairs, assets, icon_bytes = pack
+    out_path = tmp_path / "deck.pptx"
+    app.build_pack_deck("測試簡報", pairs, assets, icon_bytes, str(out_path), group_by_category=group_by_category)
+
+    expected = {open(a['media_path'], 'rb').read() for a in assets.values() if a['media_path']}
+    blobs = embedded_media(str(out_path))
+    assert set(blobs) == expected
+    assert len(blobs) == len(expected)
+    with zipfile.ZipFile(out_path) as z:
+        assert z.testzip() is None
+        assert not any(z.read(n).startswith(app.PACK_PLACEHOLDER_MAGIC) for n in z.namelist() if n.startswith("ppt/media/"))
+
+
+def test_swap_placeholders_to_file_object(tmp_path, pack):
+    pairs, assets, icon_bytes = pack
+    out = io.BytesIO()
+    app.build_pack_deck("測試簡報", pairs, assets, icon_bytes, out)
+    out.seek(0)
+    expected = {open(a['media_path'], 'rb').read() for a in assets.values() if a['media_path']}
+    assert set(embedded_media(out)) == expected
+
+
+class _StopMain(Exception):
+    pass
+
+
+@pytest.fixture
+def script_module(monkeypatch, tmp_path):
+    """像 streamlit run 一樣把 app.py 以 __main__ 再執行一次，main() 一開始就停下，只留下函數定義"""
+    def stop(*args, **kwargs): raise _StopMain
+    monkeypatch.setattr(st, "set_page_config", stop)
+    spec = importlib.util.spec_from_file_location("__main__", app.__file__)
+    module = importlib.util.module_from_spec(spec)
+    with pytest.raises(_StopMain):
+        spec.loader.exec_module(module)
+    export_dir = str(tmp_path / "exports")
+    for m in (app, module):
+        monkeypatch.setattr(m, "EXPORT_DIR", export_dir)
+    return module
+
+
+def download(token):
+    """直接以 ASGI 呼叫 app 模組的下載路由，回傳 (狀態碼, 內容)"""
+    scope = {'type': 'http', 'asgi': {'spec_version': '2.4'}, 'method': 'GET', 'path': f"/exports/{token}", 'headers': [], 'query_string': b"", 'path_params': {'token': token}}
+    messages = []
+
+    async def receive(): return {'type': 'http.request', 'body': b"", 'more_body': False}
+    async def send(message): messages.append(message)
+    async def run():
+        response = await app.export_download(Request(scope, receive))
+        await response(scope, receive, send)
+
+    asyncio.run(run())
+    status = next(m['status'] for m in messages if m['type'] == 'http.response.start')
+    return status, b"".join(m.get('body', b"") for m in messages if m['type'] == 'http.response.body')
+
+
+def test_route_downloads_deck_built_by_script(script_module, pack, tmp_path, monkeypatch):
+    pairs, assets, icon_bytes = pack
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    assets = {uid: dict(a, work_dir=str(work_dir)) for uid, a in assets.items()}
+    pairs = {uid: dict(info, case_link="x", logo_file_id=None, logo_name="") for uid, info in pairs.items()}
+    monkeypatch.setattr(script_module, "fetch_pack_assets", lambda final_pack_pairs, on_progress=None: (assets, icon_bytes, []))
+
+    job_id = script_module.submit_export_job("測試簡報", pairs)
+    job = script_module.get_export_job(job_id)
+    deadline = time.time() + 30
+    while job['status'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.05)
+    assert job['status'] == 'done', job['error']
+
+    status, body = download(job['token'])
+    assert status == 200
+    with open(job['path'], 'rb') as f:
+        assert body == f.read()
+    assert os.path.exists(job['path'])  # 下載不可連帶清掉已完成的簡報
+
+    assert download("not-a-real-token")[0] == 404
+    assert download("..")[0] == 404
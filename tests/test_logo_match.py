@@ -0,0 +1,60 @@
+"""Aho-Corasick Logo 比對在只有一個客戶命中時，必須與舊版逐一比對的迴圈結果相同"""
+import random
+
+import pandas as pd
+
+import app
+
+SYLLABLES = ["可口", "可樂", "全家", "統一", "味全", "樂事", "Abc", "乖乖", "舒跑", "黑松"]
+PREFIXES = ["飲料", "零食", "通路"]
+
+
+def legacy_guess(client_names, case_title):
+    """舊版第二階段的猜測迴圈：依試算表順序，純名稱或全名出現在標題中的第一個客戶"""
+    for client in client_names:
+        pure_name = str(client).split('_')[-1] if '_' in str(client) else str(client)
+        if pure_name in case_title or str(client) in case_title:
+            return client
+    return None
+
+
+def matching_clients(client_names, case_title):
+    return [c for c in client_names if c.split('_')[-1] in case_title or c in case_title]
+
+
+def make_clients(rng, n):
+    clients = []
+    while len(clients) < n:
+        name = "".join(rng.sample(SYLLABLES, rng.randint(1, 2)))
+        client = f"{rng.choice(PREFIXES)}_{name}" if rng.random() < 0.5 else name
+        if client not in clients: clients.append(client)
+    return clients
+
+
+def test_match_logo_agrees_with_legacy_loop_on_single_match():
+    rng = random.Random(21)
+    checked = 0
+    for _ in range(50):
+        clients = make_clients(rng, rng.randint(3, 12))
+        logo_df = pd.DataFrame({'client_name': clients, 'logo_link': [""] * len(clients)})
+        matcher = app.build_logo_table_index(logo_df).matcher
+        for _ in range(40):
+            title = "".join(rng.choice(SYLLABLES + ["企頻", "_", " ", "2024"]) for _ in range(rng.randint(1, 6)))
+            if len(matching_clients(clients, title)) != 1: continue
+            assert app.match_logo(matcher, title) == legacy_guess(clients, title), (clients, title)
+            checked += 1
+    assert checked > 100  # 確認隨機資料真的涵蓋到足夠的單一命中情境
+
+
+def test_match_logo_no_match():
+    logo_df = pd.DataFrame({'client_name': ["飲料_可口可樂", "全家"], 'logo_link': ["", ""]})
+    matcher = app.build_logo_table_index(logo_df).matcher
+    assert app.match_logo(matcher, "統一企頻 2024") is None
+    assert app.match_logo(matcher, "可口可樂新鮮視") == "飲料_可口可樂"
+
+
+def test_match_logo_prefers_longest_name():
+    # 多個客戶同時命中時刻意與舊版不同：取最長的名稱，而不是試算表中排前面的
+    logo_df = pd.DataFrame({'client_name': ["可口", "可口可樂"], 'logo_link': ["", ""]})
+    matcher = app.build_logo_table_index(logo_df).matcher
+    assert app.match_logo(matcher, "可口可樂企頻") == "可口可樂"
@@ -0,0 +1,74 @@
+"""倒排索引搜尋與逐欄 str.contains 的結果必須一致"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+ALPHABET = "全家可口樂企頻新鮮視側帶飲料零售AbCd (_.)"
+
+
+def random_text(rng, max_len=12):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+@pytest.fixture(scope="module")
+def catalogue_df():
+    rng = random.Random(7)
+    df = pd.DataFrame({field: [random_text(rng) for _ in range(400)] for field in app.SEARCH_FIELD_WEIGHTS})
+    df.loc[::37, 'title'] = ""  # 空字串列不應出現在任何結果
+    return df
+
+
+def reference_search(df, query):
+    """舊版做法：每個關鍵字對各欄位逐列 str.contains (不分大小寫、不當正規表示式)，全部命中才留下，再依命中欄位加權排序"""
+    matched, scores = np.ones(len(df), dtype=bool), np.zeros(len(df), dtype=np.int64)
+    for term in query.lower().split():
+        hits = {f: df[f].astype(str).str.lower().str.contains(term, regex=False).to_numpy() for f in app.SEARCH_FIELD_WEIGHTS}
+        matched &= np.logical_or.reduce(list(hits.values()))
+        scores += sum(w * hits[f] for f, w in app.SEARCH_FIELD_WEIGHTS.items())
+    rows = np.flatnonzero(matched)
+    return rows[np.lexsort((rows, -scores[rows]))]
+
+
+QUERIES = ["全", "可口", "可口樂", "企頻 新鮮", "abc", "ABC", "b c", "(", "_.", "全家可口樂企頻", "不存在的字", "d d"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_search_matches_str_contains(catalogue_df, query):
+    index = app.build_search_index(catalogue_df)
+    assert app.search_catalogue(index, query).tolist() == reference_search(catalogue_df, query).tolist()
+
+
+def test_search_random_substrings(catalogue_df):
+    index = app.build_search_index(catalogue_df)
+    rng = random.Random(11)
+    for _ in range(200):
+        text = catalogue_df.iloc[rng.randrange(len(catalogue_df))]['title']
+        if not text.strip(): continue
+        start = rng.randrange(len(text))
+        query = text[start:start + rng.randint(1, 5)]
+        if not query.strip(): continue
+        assert app.search_catalogue(index, query).tolist() == reference_search(catalogue_df, query).tolist(), query
+
+
+def test_blank_query_returns_nothing(catalogue_df):
+    index = app.build_search_index(catalogue_df)
+    assert len(app.search_catalogue(index, "   ")) == 0
+
+
+def test_search_random_multi_term(catalogue_df):
+    # 後面的長詞只在前面詞已命中的列裡確認，結果與排序仍須與逐欄比對相同
+    index = app.build_search_index(catalogue_df)
+    rng = random.Random(13)
+    texts = [t for t in catalogue_df['title'] if len(t.strip()) >= 3]
+    for _ in range(200):
+        terms = []
+        for _ in range(rng.randint(2, 3)):
+            text = rng.choice(texts)
+            start = rng.randrange(len(text) - 2)
+            terms.append(text[start:start + rng.randint(1, 4)].strip() or "全")
+        query = " ".join(terms)
+        assert app.search_catalogue(index, query).tolist() == reference_search(catalogue_df, query).tolist(), query